@@ -0,0 +1,117 @@
+import argparse
+import json
+import time
+
+import numpy as np
+
+import chessy3
+
+from chessy3 import Board, PIECE_CLASSES, PASSED_PAWN_BONUS, DOUBLED_PAWN_PENALTY, ISOLATED_PAWN_PENALTY
+
+# Plane of every piece in the encoded boards: the white pieces in the order
+# of PIECE_CLASSES, then the black pieces
+PLANES = [(color, char) for color in ['white', 'black'] for char in PIECE_CLASSES]
+PLANE_INDEX = {plane: index for index, plane in enumerate(PLANES)}
+
+def plane_weights():
+    # Score of a piece on every square, material value plus the piece-square
+    # table (mirrored for black), negative for black as in Piece.evaluate
+    weights = np.zeros((len(PLANES), 64), dtype = np.int64)
+    for index, (color, char) in enumerate(PLANES):
+        piece_class = PIECE_CLASSES[char]
+        for rank in range(8):
+            for file in range(8):
+                value = piece_class.value + piece_class.positional_value[rank if color == 'white' else 7 - rank][file]
+                weights[index, rank * 8 + file] = value if color == 'white' else -value
+
+    return weights
+
+WEIGHTS = plane_weights()
+RANKS = np.arange(8).reshape(1, 8, 1)
+
+def encode_boards(boards):
+    # Piece planes of shape (boards, 12, 64) and the side to move of every
+    # board, 1 for white and -1 for black
+    planes = np.zeros((len(boards), len(PLANES), 64), dtype = np.int8)
+    side_to_move = np.empty(len(boards), dtype = np.int64)
+    for board_index, board in enumerate(boards):
+        for piece in board.pieces:
+            planes[board_index, PLANE_INDEX[(piece.color, piece.char)], piece.position[0] * 8 + piece.position[1]] = 1
+        side_to_move[board_index] = 1 if board.next_move_color == 'white' else -1
+
+    return planes, side_to_move
+
+def pawn_terms(pawns, opponent_pawns, direction):
+    # Pawn structure score of one color's pawns of shape (boards, 8 ranks, 8
+    # files), direction 1 for white and -1 for black, as in
+    # chessy3.evaluate_pawn_structure
+    files = pawns.sum(axis = 1, dtype = np.int64)
+    doubled = np.maximum(files - 1, 0).sum(axis = 1)
+
+    occupied = np.pad(files > 0, ((0, 0), (1, 1)))
+    isolated = (files * ~(occupied[:, :-2] | occupied[:, 2:])).sum(axis = 1)
+
+    # Rank of the most advanced opponent pawn (in the pawn's direction) on the
+    # file and the neighbouring files, a pawn is passed if it is not behind it
+    ranks = RANKS * direction
+    front = np.where(opponent_pawns, ranks, -8).max(axis = 1)
+    front = np.pad(front, ((0, 0), (1, 1)), constant_values = -8)
+    front = np.maximum(np.maximum(front[:, :-2], front[:, 1:-1]), front[:, 2:])
+    passed = pawns.astype(bool) & (ranks >= front[:, np.newaxis, :])
+    bonus = np.array(PASSED_PAWN_BONUS if direction == 1 else PASSED_PAWN_BONUS[::-1]).reshape(1, 8, 1)
+
+    return (passed * bonus).sum(axis = (1, 2)) - DOUBLED_PAWN_PENALTY * doubled - ISOLATED_PAWN_PENALTY * isolated
+
+def evaluate_planes(planes, side_to_move):
+    # Static evaluation of encoded boards from the point of view of the side
+    # to move, as Board.evaluate(depth = 0) returns it
+    score = np.einsum('bps,ps->b', planes, WEIGHTS)
+    if chessy3.PAWN_STRUCTURE:
+        white_pawns = planes[:, PLANE_INDEX[('white', 'p')]].reshape(-1, 8, 8)
+        black_pawns = planes[:, PLANE_INDEX[('black', 'p')]].reshape(-1, 8, 8)
+        score = score + pawn_terms(white_pawns, black_pawns, 1) - pawn_terms(black_pawns, white_pawns, -1)
+
+    return score * side_to_move
+
+def evaluate_boards(boards):
+    return evaluate_planes(*encode_boards(boards))
+
+def compare(boards):
+    # Evaluate the boards one by one and as a batch, with the timings
+    start = time.perf_counter()
+    scalar = [board.evaluate()['value'] for board in boards]
+    scalar_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    planes, side_to_move = encode_boards(boards)
+    encode_time = time.perf_counter() - start
+    start = time.perf_counter()
+    batch = evaluate_planes(planes, side_to_move)
+    batch_time = time.perf_counter() - start
+
+    return {
+        'positions': len(boards),
+        'identical': scalar == batch.tolist(),
+        'scalar_time': round(scalar_time, 4),
+        'encode_time': round(encode_time, 4),
+        'batch_time': round(batch_time, 4)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Evaluate the positions of a FEN or EPD file as a batch')
+    parser.add_argument('positions', help = 'file with one FEN or EPD record per line')
+    parser.add_argument('--compare', action = 'store_true', help = 'also evaluate one by one and report the timings')
+    args = parser.parse_args()
+
+    with open(args.positions) as positions:
+        lines = [line.strip() for line in positions if line.strip() and not line.startswith('#')]
+    boards = [Board.from_fen(' '.join(line.split()[:4])) for line in lines]
+
+    if args.compare:
+        print(json.dumps(compare(boards), indent = 2))
+    else:
+        for line, value in zip(lines, evaluate_boards(boards).tolist()):
+            print(' '.join(line.split()[:4]), value)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+# Bitboard move generator. A bitboard is an int with bit rank * 8 + file set
+# for every occupied square, the same square numbering as the Board mailbox.
+# Positions are given as one bitboard per color and piece type, moves are
+# returned as (origin, target, flag) square index tuples.
+
+WHITE = 0
+BLACK = 1
+
+PAWN = 0
+KNIGHT = 1
+BISHOP = 2
+ROOK = 3
+QUEEN = 4
+KING = 5
+
+# Move flags
+QUIET = 0
+CAPTURE = 1
+DOUBLE_PAWN_PUSH = 2
+EN_PASSANT = 3
+PROMOTION = 4
+PROMOTION_CAPTURE = 5
+CASTLING = 6
+
+# Castling rights bits, in the order of Board.castling_rights
+CASTLING_RIGHTS = [
+    # (color, king origin, king target, squares that must be empty)
+    (WHITE, 4, 2, [1, 2, 3]),
+    (WHITE, 4, 6, [5, 6]),
+    (BLACK, 60, 58, [57, 58, 59]),
+    (BLACK, 60, 62, [61, 62])
+]
+
+RANK_1 = 0xff
+RANK_2 = RANK_1 << 8
+RANK_7 = RANK_1 << 48
+RANK_8 = RANK_1 << 56
+FILE_A = 0x0101010101010101
+FILE_H = FILE_A << 7
+FULL = (1 << 64) - 1
+
+def offset_targets(square, offsets):
+    rank, file = divmod(square, 8)
+    targets = 0
+    for rank_offset, file_offset in offsets:
+        target_rank, target_file = rank + rank_offset, file + file_offset
+        if 0 <= target_rank <= 7 and 0 <= target_file <= 7:
+            targets |= 1 << (target_rank * 8 + target_file)
+
+    return targets
+
+def ray(square, direction):
+    # Square indices from square (exclusive) to the edge of the board
+    rank, file = divmod(square, 8)
+    squares = []
+    rank, file = rank + direction[0], file + direction[1]
+    while 0 <= rank <= 7 and 0 <= file <= 7:
+        squares.append(rank * 8 + file)
+        rank, file = rank + direction[0], file + direction[1]
+
+    return squares
+
+def line_tables(square, directions):
+    # Attack lookup for one line (two opposite directions) through square.
+    # The relevant occupancy excludes the edge squares, since a piece there
+    # does not change the attacked squares. Every subset of the mask maps to
+    # its attack set, so a lookup is a dict access with the masked occupancy
+    # as key (the dict hash takes the place of a magic multiplication).
+    rays = [ray(square, direction) for direction in directions]
+    mask = 0
+    for squares in rays:
+        for target in squares[:-1]:
+            mask |= 1 << target
+
+    attacks = {}
+    subset = 0
+    while True:
+        attacked = 0
+        for squares in rays:
+            for target in squares:
+                attacked |= 1 << target
+                if subset >> target & 1:
+                    break
+        attacks[subset] = attacked
+
+        # Next subset of mask (Carry-Rippler)
+        subset = (subset - mask) & mask
+        if subset == 0:
+            break
+
+    return mask, attacks
+
+KNIGHT_ATTACKS = [offset_targets(square, [(2, 1), (1, 2), (-2, 1), (1, -2), (2, -1), (-1, 2), (-2, -1), (-1, -2)]) for square in range(64)]
+KING_ATTACKS = [offset_targets(square, [(1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1)]) for square in range(64)]
+PAWN_ATTACKS = [
+    [offset_targets(square, [(1, 1), (1, -1)]) for square in range(64)],
+    [offset_targets(square, [(-1, 1), (-1, -1)]) for square in range(64)]
+]
+
+STRAIGHT_LINES = [[line_tables(square, directions) for square in range(64)] for directions in [[(1, 0), (-1, 0)], [(0, 1), (0, -1)]]]
+DIAGONAL_LINES = [[line_tables(square, directions) for square in range(64)] for directions in [[(1, 1), (-1, -1)], [(1, -1), (-1, 1)]]]
+
+def rook_attacks(square, occupancy):
+    file_mask, file_attacks = STRAIGHT_LINES[0][square]
+    rank_mask, rank_attacks = STRAIGHT_LINES[1][square]
+    return file_attacks[occupancy & file_mask] | rank_attacks[occupancy & rank_mask]
+
+def bishop_attacks(square, occupancy):
+    diagonal_mask, diagonal_attacks = DIAGONAL_LINES[0][square]
+    anti_diagonal_mask, anti_diagonal_attacks = DIAGONAL_LINES[1][square]
+    return diagonal_attacks[occupancy & diagonal_mask] | anti_diagonal_attacks[occupancy & anti_diagonal_mask]
+
+def squares_of(bitboard):
+    while bitboard:
+        lowest = bitboard & -bitboard
+        yield lowest.bit_length() - 1
+        bitboard ^= lowest
+
+def is_attacked(pieces, square, color):
+    # Is square attacked by a piece of the opposite color of color
+    them = pieces[color ^ 1]
+    occupancy = occupancy_of(pieces)
+    return bool(
+        KNIGHT_ATTACKS[square] & them[KNIGHT]
+        or KING_ATTACKS[square] & them[KING]
+        or PAWN_ATTACKS[color][square] & them[PAWN]
+        or rook_attacks(square, occupancy) & (them[ROOK] | them[QUEEN])
+        or bishop_attacks(square, occupancy) & (them[BISHOP] | them[QUEEN])
+    )
+
+def occupancy_of(pieces):
+    occupancy = 0
+    for bitboard in pieces[WHITE] + pieces[BLACK]:
+        occupancy |= bitboard
+
+    return occupancy
+
+def generate_moves(pieces, color, castling_rights = 0, en_passant_file = None):
+    # Pseudo-legal moves of color. pieces[color][piece type] are bitboards,
+    # castling_rights uses the bits of CASTLING_RIGHTS and en_passant_file is
+    # the file a pawn of color may capture en passant on.
+    us = 0
+    for bitboard in pieces[color]:
+        us |= bitboard
+    them = 0
+    for bitboard in pieces[color ^ 1]:
+        them |= bitboard
+    occupancy = us | them
+    empty = ~occupancy & FULL
+    moves = []
+
+    # Pawns: single and double pushes, captures, promotions and en passant
+    pawns = pieces[color][PAWN]
+    if color == WHITE:
+        forward = 8
+        single = (pawns << 8) & empty
+        double = ((single & (RANK_2 << 8)) << 8) & empty
+        promotion_rank = RANK_8
+        en_passant_rank = 5
+    else:
+        forward = -8
+        single = (pawns >> 8) & empty
+        double = ((single & (RANK_7 >> 8)) >> 8) & empty
+        promotion_rank = RANK_1
+        en_passant_rank = 2
+
+    for target in squares_of(single):
+        moves.append((target - forward, target, PROMOTION if 1 << target & promotion_rank else QUIET))
+    for target in squares_of(double):
+        moves.append((target - 2 * forward, target, DOUBLE_PAWN_PUSH))
+    for origin in squares_of(pawns):
+        attacks = PAWN_ATTACKS[color][origin]
+        for target in squares_of(attacks & them):
+            moves.append((origin, target, PROMOTION_CAPTURE if 1 << target & promotion_rank else CAPTURE))
+        if en_passant_file is not None:
+            en_passant_square = en_passant_rank * 8 + en_passant_file
+            if attacks & 1 << en_passant_square:
+                moves.append((origin, en_passant_square, EN_PASSANT))
+
+    # Knights, sliders and king
+    for piece_type in [KNIGHT, BISHOP, ROOK, QUEEN, KING]:
+        for origin in squares_of(pieces[color][piece_type]):
+            if piece_type == KNIGHT:
+                targets = KNIGHT_ATTACKS[origin]
+            elif piece_type == BISHOP:
+                targets = bishop_attacks(origin, occupancy)
+            elif piece_type == ROOK:
+                targets = rook_attacks(origin, occupancy)
+            elif piece_type == QUEEN:
+                targets = bishop_attacks(origin, occupancy) | rook_attacks(origin, occupancy)
+            else:
+                targets = KING_ATTACKS[origin]
+
+            for target in squares_of(targets & them):
+                moves.append((origin, target, CAPTURE))
+            for target in squares_of(targets & empty):
+                moves.append((origin, target, QUIET))
+
+    # Castling, the attacked squares on the king's path are checked by the
+    # caller like for the mailbox generator
+    for bit, (castling_color, origin, target, free_squares) in enumerate(CASTLING_RIGHTS):
+        if castling_color == color and castling_rights >> bit & 1 and not any(occupancy >> square & 1 for square in free_squares):
+            moves.append((origin, target, CASTLING))
+
+    return moves
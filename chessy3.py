@@ -1,8 +1,39 @@
+import cProfile
+import json
+import pstats
+import random
 import time
+from multiprocessing import resource_tracker, shared_memory
+
+import bitboard
+import polyglot
 
 # Settings
 DEPTH = 4
+# Seconds per move for iterative deepening, None to always search to DEPTH
+TIME_PER_MOVE = 5
 EVALUATE_FOR = ['white']
+# Check the incrementally updated evaluation against a full recomputation
+DEBUG_EVALUATION = False
+# Move generator used by the search and perft: 'mailbox' walks the piece
+# move patterns, 'bitboard' uses the precomputed attack tables of bitboard.py
+MOVE_GENERATOR = 'mailbox'
+# Legality check of the generated moves: 'pins' works out the checking and
+# pinned pieces once per position, 'make' makes every move and tests for check
+LEGALITY_CHECK = 'pins'
+HASH_SIZE_MB = 16
+# Pawn structure terms in the evaluation, cached in a pawn hash table
+PAWN_STRUCTURE = True
+PAWN_HASH_SIZE_MB = 1
+# 'depth': keep the deeper entry unless it is left over from an earlier search
+# 'always': always overwrite with the newest entry
+TT_REPLACEMENT = 'depth'
+# Size of the transposition table shared by the processes of a parallel search
+SHARED_HASH_SIZE_MB = 16
+# Polyglot opening book consulted before searching, None to always search
+BOOK_FILE = None
+# 'weighted': random book move by weight, 'best': book move with the highest weight
+BOOK_SELECTION = 'weighted'
 
 MOVE_PATTERNS = {
     'pawn': {
@@ -57,21 +88,202 @@ CASTLING = {
     ]
 }
 
+def ray_squares(rank, file, pattern, repeat):
+    # Indices of the squares reached from (rank, file) by repeating pattern
+    # (or applying it once) until the edge of the board
+    squares = []
+    rank, file = rank + pattern[0], file + pattern[1]
+    while 0 <= rank <= 7 and 0 <= file <= 7:
+        squares.append(rank * 8 + file)
+        if not repeat:
+            break
+        rank, file = rank + pattern[0], file + pattern[1]
+
+    return squares
+
+# Precomputed target squares per square index, used to find attackers of a
+# square by looking outward from it
+KNIGHT_SQUARES = [[square for pattern in MOVE_PATTERNS['knight'] for square in ray_squares(index // 8, index % 8, pattern, False)] for index in range(64)]
+KING_SQUARES = [[square for pattern in MOVE_PATTERNS['straight'] + MOVE_PATTERNS['diagonal'] for square in ray_squares(index // 8, index % 8, pattern, False)] for index in range(64)]
+STRAIGHT_RAYS = [[ray_squares(index // 8, index % 8, pattern, True) for pattern in MOVE_PATTERNS['straight']] for index in range(64)]
+DIAGONAL_RAYS = [[ray_squares(index // 8, index % 8, pattern, True) for pattern in MOVE_PATTERNS['diagonal']] for index in range(64)]
+# Rays per piece type and square, for generating the captures and the quiet
+# moves separately
+PIECE_RAYS = {
+    'k': [[[square] for square in squares] for squares in KING_SQUARES],
+    'q': [straight + diagonal for straight, diagonal in zip(STRAIGHT_RAYS, DIAGONAL_RAYS)],
+    'r': STRAIGHT_RAYS,
+    'b': DIAGONAL_RAYS,
+    'n': [[[square] for square in squares] for squares in KNIGHT_SQUARES]
+}
+POSITIONS = [(index // 8, index % 8) for index in range(64)]
+# Squares a pawn of the given color attacks the square from
+PAWN_ATTACKER_SQUARES = {
+    color: [[square for pattern in MOVE_PATTERNS['pawn'][color]['attack'] for square in ray_squares(index // 8, index % 8, (-pattern[0], -pattern[1]), False)] for index in range(64)]
+    for color in ['white', 'black']
+}
+
+NO_EN_PASSANT = {
+    'white': [False] * 8,
+    'black': [False] * 8
+}
+EN_PASSANT_FILES = [[file == en_passant_file for file in range(8)] for en_passant_file in range(8)]
+
+# Zobrist keys: one per piece type, color and square, plus keys for the side to
+# move, the castling rights (one per combination) and the en passant file.
+ZOBRIST_SEED = 20190512
+zobrist_random = random.Random(ZOBRIST_SEED)
+ZOBRIST_PIECES = {
+    color: {char: [zobrist_random.getrandbits(64) for square in range(64)] for char in 'kqrbnp'}
+    for color in ['white', 'black']
+}
+ZOBRIST_BLACK_TO_MOVE = zobrist_random.getrandbits(64)
+ZOBRIST_CASTLING = [zobrist_random.getrandbits(64) for rights in range(16)]
+ZOBRIST_EN_PASSANT = [zobrist_random.getrandbits(64) for file in range(8)]
+
+# Bound types of transposition table entries
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+# Rough size in bytes of one transposition table entry as stored by CPython
+# (entry tuple, key and slot in the entry list)
+TT_ENTRY_SIZE = 160
+# Bytes per entry of the shared transposition table: the key xor the data and
+# the data, as two 64 bit words. The data word holds the value (offset to be
+# positive), depth, bound, generation and packed move.
+SHARED_TT_ENTRY_SIZE = 16
+SHARED_TT_VALUE_OFFSET = 1 << 23
+
+# Pawn structure: bonus for a passed pawn by its rank counted from its own
+# side, and penalties for every pawn more than one on a file and for pawns
+# without pawns of their color on the neighbouring files. The score only
+# depends on the pawns, so it is kept in the pawn hash table under the Zobrist
+# key of the pawns alone.
+PASSED_PAWN_BONUS = [0, 5, 10, 20, 35, 60, 100, 0]
+DOUBLED_PAWN_PENALTY = 15
+ISOLATED_PAWN_PENALTY = 10
+# Rough size in bytes of one pawn hash table entry (entry tuple, key, score
+# and slot in the entry list)
+PAWN_ENTRY_SIZE = 128
+
+# Moves packed into an int: origin square | target square << 6 | special move
+# << 12 (index in MOVE_FLAGS) | capture << 15 | promotion piece << 16 (index in
+# PROMOTION_PIECES). Every move packs to a non-zero int, so 0 can mean no move.
+MOVE_FLAGS = [False, 'pawn_double', 'castling', 'en_passant', 'promotion']
+MOVE_FLAG_CODES = {flag: code for code, flag in enumerate(MOVE_FLAGS)}
+PROMOTION_PIECES = ['', 'n', 'b', 'r', 'q']
+
+# Move ordering, MOVE_ORDERING = False searches moves in generation order
+# (apart from the hash move)
+MOVE_ORDERING = True
+# Generate the moves of a node in stages (hash move, captures, killers, quiet
+# moves), each only if the moves before did not cause a cutoff
+STAGED_MOVE_GENERATION = True
+HASH_MOVE_SCORE = 10000000
+CAPTURE_SCORE = 1000000
+KILLER_SCORE = 500000
+HISTORY_MAX = 400000
+
+# Quiescence search at the horizon, with delta pruning (DELTA_MARGIN is the
+# safety margin) and optional static exchange evaluation of captures
+QUIESCENCE = True
+DELTA_PRUNING = True
+DELTA_MARGIN = 200
+SEE_PRUNING = False
+
+# Selective search: null move pruning (skipped when only king and pawns are
+# left, where zugzwang is common), late move reductions of quiet moves after
+# the first LMR_FULL_DEPTH_MOVES, and one ply more for moves giving check
+NULL_MOVE_PRUNING = True
+NULL_MOVE_REDUCTION = 2
+LATE_MOVE_REDUCTIONS = True
+LMR_FULL_DEPTH_MOVES = 4
+LMR_MIN_DEPTH = 3
+CHECK_EXTENSIONS = True
+
+# Principal variation search: moves after the first are searched with a null
+# window, and again with the full window only if they beat α. Iterations after
+# the first search a window of ASPIRATION_WINDOW around the previous score,
+# None to always search the full window.
+PRINCIPAL_VARIATION_SEARCH = True
+ASPIRATION_WINDOW = 50
+
+# Draws in search: a position repeating one reached earlier in the game or
+# search, or one after 100 moves without capture or pawn move, scores
+# DRAW_VALUE. Only positions since the last capture or pawn move are compared.
+DRAW_DETECTION = True
+DRAW_VALUE = 0
+
+# Iterative deepening and time control
+MAX_DEPTH = 64
+# Check the clock every this many nodes
+TIME_CHECK_INTERVAL = 1024
+# Do not start a new iteration after this fraction of the time limit
+ITERATION_TIME_FRACTION = 0.4
+# Number of moves to plan for when there is no moves to go information
+MOVES_TO_GO = 30
+# Seconds kept in reserve when allocating time from a clock
+TIME_SAFETY_MARGIN = 0.05
+
+# Search statistics: INSTRUMENTATION counts the calls of and time spent in move
+# generation, attack tests, evaluation and board copies (slowing the search
+# down), PROFILE_SEARCH runs searches under cProfile and reports the
+# PROFILE_FUNCTIONS functions taking the most time, and with STATISTICS_FILE
+# set every search appends its statistics to that file as a line of JSON
+INSTRUMENTATION = False
+PROFILE_SEARCH = False
+PROFILE_FUNCTIONS = 20
+STATISTICS_FILE = None
+
+START_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+
 MATE_THRESHOLD = 10000
+# Value of a mate: capturing the king, less the plies from the root to the
+# capture, so that shorter mates score higher
+MATE_VALUE = 60000
 INFINITY = 100000
 FILES = [i-1 for i in range(8)]
+OPPOSITE_COLORS = {'white': 'black', 'black': 'white'}
 
 class Board:
     def __init__(self):
-        self.pieces = []
+        # Pieces are kept in an insertion ordered dict (used as an ordered set)
+        # so they can be removed in constant time. The mailbox holds the same
+        # pieces indexed by square (rank * 8 + file).
+        self.pieces = {}
+        self.squares = [None] * 64
+        self.kings = {}
+        # Zobrist hash of the piece placement, updated whenever a piece is
+        # added, removed or moved. See zobrist_key for the full position key.
+        self.hash = 0
+        # Zobrist hash of the pawns alone, the key of the pawn hash table
+        self.pawn_hash = 0
+        self.pawn_table = default_pawn_table
+        # Castling rights (see castling_rights), updated whenever a king or
+        # rook is added, removed or loses its right to castle
+        self.castling = 0
+        # Material and piece-square score from white's point of view, updated
+        # whenever a piece is added, removed or moved
+        self.score = 0
         self.next_move_color = 'white'
         self.last_move = None
+        self.move_generator = MOVE_GENERATOR
+        self.legality_check = LEGALITY_CHECK
+        self.history = []
+        # Moves since the last capture or pawn move, and the move number
+        self.halfmove_clock = 0
+        self.fullmove_number = 1
         self.reset_en_passant()
         
     def reset_en_passant(self):
+        # The en passant state is never mutated in place, so all boards
+        # without en passant rights can share the same lists.
+        self.en_passant = NO_EN_PASSANT
+
+    def set_en_passant(self, color, file):
         self.en_passant = {
-            'white': [False] * 8,
-            'black': [False] * 8
+            color: EN_PASSANT_FILES[file],
+            opposite_color(color): NO_EN_PASSANT[opposite_color(color)]
         }
     
     def show(self):
@@ -87,17 +299,111 @@ class Board:
             print(file_string)
         
     def get_piece_by_position(self, position):
-        for piece in self.pieces:
-            if piece.position == position:
-                return piece
-        
+        rank, file = position
+        if 0 <= rank <= 7 and 0 <= file <= 7:
+            return self.squares[rank * 8 + file]
+
         return None
-        
+
+    def add_piece(self, piece):
+        self.pieces[piece] = None
+        self.squares[square_index(piece.position)] = piece
+        self.hash ^= ZOBRIST_PIECES[piece.color][piece.char][square_index(piece.position)]
+        if piece.char == 'p':
+            self.pawn_hash ^= ZOBRIST_PIECES[piece.color]['p'][square_index(piece.position)]
+        self.score += piece.evaluate()
+        if isinstance(piece, King):
+            self.kings[piece.color] = piece
+        if isinstance(piece, CastlePiece):
+            self.castling = self.castling_rights()
+
+    def remove_piece(self, piece):
+        del self.pieces[piece]
+        self.squares[square_index(piece.position)] = None
+        self.hash ^= ZOBRIST_PIECES[piece.color][piece.char][square_index(piece.position)]
+        if piece.char == 'p':
+            self.pawn_hash ^= ZOBRIST_PIECES[piece.color]['p'][square_index(piece.position)]
+        self.score -= piece.evaluate()
+        if self.kings.get(piece.color) is piece:
+            del self.kings[piece.color]
+        if isinstance(piece, CastlePiece):
+            self.castling = self.castling_rights()
+
+    def relocate_piece(self, piece, target_position):
+        keys = ZOBRIST_PIECES[piece.color][piece.char]
+        origin_index = square_index(piece.position)
+        target_index = square_index(target_position)
+        self.squares[origin_index] = None
+        self.squares[target_index] = piece
+        self.hash ^= keys[origin_index] ^ keys[target_index]
+        if piece.char == 'p':
+            self.pawn_hash ^= keys[origin_index] ^ keys[target_index]
+        self.score -= piece.evaluate()
+        piece.position = target_position
+        self.score += piece.evaluate()
+
+    def castling_rights(self):
+        # Bit set of the castlings that are still possible, in the order of
+        # CASTLING (white long, white short, black long, black short)
+        rights = 0
+        bit = 1
+        for color in ['white', 'black']:
+            king = self.kings.get(color)
+            king_can_castle = king is not None and king.can_castle and king.position == CASTLING[color][0]['king_move'][0]
+            for castling in CASTLING[color]:
+                rook = self.get_piece_by_position(castling['rook'])
+                if king_can_castle and isinstance(rook, Rook) and rook.color == color and rook.can_castle:
+                    rights |= bit
+                bit <<= 1
+
+        return rights
+
+    def zobrist_key(self):
+        # The piece placement and castling rights are kept incrementally, the
+        # side to move and en passant file are folded in here as they can be
+        # read from the board in constant time.
+        key = self.hash ^ ZOBRIST_CASTLING[self.castling]
+        if self.next_move_color == 'black':
+            key ^= ZOBRIST_BLACK_TO_MOVE
+        if self.en_passant is not NO_EN_PASSANT:
+            for files in self.en_passant.values():
+                if True in files:
+                    key ^= ZOBRIST_EN_PASSANT[files.index(True)]
+
+        return key
+
+    def polyglot_key(self):
+        # Key of the position in Polyglot opening books
+        key = 0
+        for piece in self.pieces:
+            key ^= polyglot.piece_key(piece.char, piece.color == 'white', square_index(piece.position))
+
+        rights = self.castling_rights()
+        for bit, index in enumerate([1, 0, 3, 2]):
+            if rights & 1 << bit:
+                key ^= polyglot.RANDOM64[polyglot.RANDOM_CASTLING + index]
+
+        # The en passant file only counts if a pawn can capture en passant
+        files = self.en_passant[self.next_move_color]
+        if True in files:
+            file = files.index(True)
+            rank = 4 if self.next_move_color == 'white' else 3
+            for position in [(rank, file - 1), (rank, file + 1)]:
+                piece = self.get_piece_by_position(position)
+                if isinstance(piece, Pawn) and piece.color == self.next_move_color:
+                    key ^= polyglot.RANDOM64[polyglot.RANDOM_EN_PASSANT + file]
+                    break
+
+        if self.next_move_color == 'white':
+            key ^= polyglot.RANDOM64[polyglot.RANDOM_TURN]
+
+        return key
+
     def remove_piece_by_position(self, position):
         piece = self.get_piece_by_position(position)
         if piece is None:
             print('Hughe Fail!!')
-        self.pieces.remove(piece)
+        self.remove_piece(piece)
             
     def get_pieces_by_color(self, color):
         for piece in self.pieces:
@@ -105,112 +411,612 @@ class Board:
                 yield piece
         
     def get_moves_for_color(self, color, verify_no_check = True):
-        for piece in self.get_pieces_by_color(color):
-            for move in piece.generate_moves(verify_no_check):
-                yield move
-
+        for move in self.get_move_list_for_color(color, verify_no_check):
+            yield self.copy_and_execute_move(move)
         
     def get_pseudo_legal_moves_for_color(self, color):
         for piece in self.get_pieces_by_color(color):
             for move in piece.generate_pseudo_legal_moves():
                 yield move
+
+    def get_move_list_for_color(self, color, verify_no_check = True):
+        # Same moves as get_moves_for_color, but as a list of Move objects
+        # instead of a board copy per move. The list is built before any move
+        # is made, as making moves changes the pieces.
+        if self.move_generator == 'bitboard':
+            pseudo_legal_moves = self.get_bitboard_moves_for_color(color)
+        else:
+            pseudo_legal_moves = [move for piece in self.get_pieces_by_color(color) for move in piece.pseudo_legal_moves()]
+
+        moves = []
+        for move in pseudo_legal_moves:
+            if move.special_move == 'castling' and any(self.is_attacked(position, color) for position in move.move_info['king_path']):
+                continue
+
+            moves.append(move)
+
+        if not verify_no_check:
+            return moves
+        elif self.legality_check == 'make':
+            return self.get_legal_moves_by_making(moves, color)
+        else:
+            return self.get_legal_moves(moves, color)
+
+    def get_capture_list_for_color(self, color):
+        # Captures and promotions, without generating the quiet moves
+        if self.move_generator == 'bitboard':
+            return [move for move in self.get_bitboard_moves_for_color(color) if move.is_capture or move.special_move == 'promotion']
+
+        return [move for piece in list(self.get_pieces_by_color(color)) for move in piece.pseudo_legal_captures()]
+
+    def get_quiet_list_for_color(self, color):
+        # The pseudo-legal moves get_capture_list_for_color leaves out, without
+        # generating the captures again
+        if self.move_generator == 'bitboard':
+            quiet_moves = [move for move in self.get_bitboard_moves_for_color(color) if not move.is_capture and move.special_move != 'promotion']
+        else:
+            quiet_moves = [move for piece in list(self.get_pieces_by_color(color)) for move in piece.pseudo_legal_quiets()]
+
+        return [move for move in quiet_moves if move.special_move != 'castling' or not any(self.is_attacked(position, color) for position in move.move_info['king_path'])]
+
+    def find_pseudo_legal_move(self, move):
+        # The generated move equal to a move from another position (e.g. a
+        # hash or killer move) if it can be played here, else None
+        piece = self.squares[square_index(move.origin)]
+        if piece is None or piece.color != self.next_move_color:
+            return None
+
+        for candidate in piece.pseudo_legal_moves():
+            if candidate == move:
+                if candidate.special_move == 'castling' and any(self.is_attacked(position, piece.color) for position in candidate.move_info['king_path']):
+                    return None
+                return candidate
+
+        return None
+
+    def get_legal_moves_by_making(self, moves, color):
+        legal_moves = []
+        for move in moves:
+            self.make_move(move)
+            if not self.is_checked(color):
+                legal_moves.append(move)
+            self.unmake_move()
+
+        return legal_moves
+
+    def get_legal_moves(self, moves, color):
+        # The legal moves among pseudo-legal moves without castling through
+        # attacked squares, from the pieces giving check and the pinned pieces
+        king = self.kings.get(color)
+        if king is None:
+            return moves
+
+        squares = self.squares
+        king_index = square_index(king.position)
+        checkers = self.get_attackers(king.position, color)
+        pins = self.get_pins(color)
+
+        # In check by one piece, other pieces have to capture it or, if it is
+        # a slider, move in between
+        evasion_squares = None
+        if len(checkers) == 1:
+            checker_index = square_index(checkers[0].position)
+            evasion_squares = {checker_index}
+            if isinstance(checkers[0], (Queen, Rook, Bishop)):
+                for ray in STRAIGHT_RAYS[king_index] + DIAGONAL_RAYS[king_index]:
+                    if checker_index in ray:
+                        evasion_squares.update(ray[:ray.index(checker_index)])
+
+        legal_moves = []
+        for move in moves:
+            if move.origin == king.position:
+                if move.special_move == 'castling':
+                    if checkers or self.is_attacked(move.target, color):
+                        continue
+                else:
+                    # Take the king off the board, so it can not hide from a
+                    # slider behind itself
+                    squares[king_index] = None
+                    attacked = self.is_attacked(move.target, color)
+                    squares[king_index] = king
+                    if attacked:
+                        continue
+
+            elif len(checkers) > 1:
+                continue
+
+            elif move.special_move == 'en_passant':
+                # Taking two pawns off the rank can expose the king, so en
+                # passant is tested by making the move
+                self.make_move(move)
+                checked = self.is_checked(color)
+                self.unmake_move()
+                if checked:
+                    continue
+
+            else:
+                target_index = square_index(move.target)
+                if evasion_squares is not None and target_index not in evasion_squares:
+                    continue
+                pin = pins.get(squares[square_index(move.origin)])
+                if pin is not None and target_index not in pin:
+                    continue
+
+            legal_moves.append(move)
+
+        return legal_moves
+
+    def get_pins(self, color):
+        # Pieces pinned to the king of the color, with the squares they can
+        # still move to: the line up to and including the pinning piece
+        squares = self.squares
+        king_index = square_index(self.kings[color].position)
+        pins = {}
+        for rays, attacker in ((STRAIGHT_RAYS, Rook), (DIAGONAL_RAYS, Bishop)):
+            for ray in rays[king_index]:
+                pinned = None
+                for distance, square in enumerate(ray):
+                    piece = squares[square]
+                    if piece is None:
+                        continue
+                    if pinned is None and piece.color == color:
+                        pinned = piece
+                        continue
+                    if pinned is not None and piece.color != color and isinstance(piece, (attacker, Queen)):
+                        pins[pinned] = set(ray[:distance + 1])
+                    break
+
+        return pins
         
+    def get_bitboards(self):
+        # One bitboard per color and piece type, as used by bitboard.py
+        pieces = [[0] * 6, [0] * 6]
+        for piece in self.pieces:
+            pieces[BITBOARD_COLORS[piece.color]][BITBOARD_PIECES[piece.char]] |= 1 << square_index(piece.position)
+
+        return pieces
+
+    def get_bitboard_moves_for_color(self, color):
+        en_passant_file = self.en_passant[color].index(True) if True in self.en_passant[color] else None
+        moves = []
+        for origin, target, flag in bitboard.generate_moves(self.get_bitboards(), BITBOARD_COLORS[color], self.castling, en_passant_file):
+            origin = (origin // 8, origin % 8)
+            target = (target // 8, target % 8)
+            if flag == bitboard.CASTLING:
+                castling = CASTLING[color][0 if target[1] == 2 else 1]
+                moves.append(Move(origin, target, special_move = 'castling', move_info = castling))
+            else:
+                moves.append(Move(origin, target, special_move = BITBOARD_SPECIAL_MOVES[flag], is_capture = flag in BITBOARD_CAPTURES))
+
+        return moves
+
     def is_attacked(self, position, color):
+        # Look outward from the square for an opposite color piece that
+        # attacks it, instead of generating the opponent's moves
         op_color = opposite_color(color)
-        for move in self.get_pseudo_legal_moves_for_color(op_color):
-            piece = move.get_piece_by_position(position)
-            if piece is not None and piece.color == op_color:
+        squares = self.squares
+        index = square_index(position)
+
+        for square in KNIGHT_SQUARES[index]:
+            piece = squares[square]
+            if piece is not None and piece.color == op_color and isinstance(piece, Knight):
+                return True
+
+        for square in PAWN_ATTACKER_SQUARES[op_color][index]:
+            piece = squares[square]
+            if piece is not None and piece.color == op_color and isinstance(piece, Pawn):
                 return True
 
+        for square in KING_SQUARES[index]:
+            piece = squares[square]
+            if piece is not None and piece.color == op_color and isinstance(piece, King):
+                return True
+
+        for rays, attacker in ((STRAIGHT_RAYS, Rook), (DIAGONAL_RAYS, Bishop)):
+            for ray in rays[index]:
+                for square in ray:
+                    piece = squares[square]
+                    if piece is not None:
+                        if piece.color == op_color and isinstance(piece, (attacker, Queen)):
+                            return True
+                        break
+
         return False
     
+    def get_attackers(self, position, color):
+        # Opposite color pieces attacking the square, found like in is_attacked
+        op_color = opposite_color(color)
+        squares = self.squares
+        index = square_index(position)
+        attackers = []
+
+        for square_table, attacker in ((KNIGHT_SQUARES, Knight), (PAWN_ATTACKER_SQUARES[op_color], Pawn), (KING_SQUARES, King)):
+            for square in square_table[index]:
+                piece = squares[square]
+                if piece is not None and piece.color == op_color and isinstance(piece, attacker):
+                    attackers.append(piece)
+
+        for rays, attacker in ((STRAIGHT_RAYS, Rook), (DIAGONAL_RAYS, Bishop)):
+            for ray in rays[index]:
+                for square in ray:
+                    piece = squares[square]
+                    if piece is not None:
+                        if piece.color == op_color and isinstance(piece, (attacker, Queen)):
+                            attackers.append(piece)
+                        break
+
+        return attackers
+
     def get_king_by_color(self, color):
-        for piece in self.pieces:
-            if isinstance(piece, King) and piece.color == color:
-                return piece
-        return None
+        return self.kings.get(color)
     
     def is_checked(self, color):
         king = self.get_king_by_color(color)
         return self.is_attacked(king.position, color)
+
+    def has_non_pawn_material(self, color):
+        return any(piece.color == color and not isinstance(piece, (King, Pawn)) for piece in self.pieces)
     
-    def copy_and_execute_move(self, move):
-        # Copy the board
+    @classmethod
+    def from_fen(cls, fen):
+        # Piece placement, side to move, castling rights, en passant square
+        # and the optional move counters
+        fields = fen.split()
+        placement, color, castling, en_passant = fields[:4]
+        board = cls()
+
+        for rank_index, rank_string in enumerate(placement.split('/')):
+            file = 0
+            for char in rank_string:
+                if char.isdigit():
+                    file += int(char)
+                    continue
+
+                piece_class = PIECE_CLASSES[char.lower()]
+                piece_color = 'white' if char.isupper() else 'black'
+                if issubclass(piece_class, CastlePiece):
+                    piece_class(board, (7 - rank_index, file), piece_color, can_castle = False)
+                else:
+                    piece_class(board, (7 - rank_index, file), piece_color)
+                file += 1
+
+        board.next_move_color = 'white' if color == 'w' else 'black'
+
+        for char in castling.replace('-', ''):
+            castle_color = 'white' if char.isupper() else 'black'
+            castling_info = CASTLING[castle_color][0 if char.lower() == 'q' else 1]
+            king = board.get_piece_by_position(castling_info['king_move'][0])
+            rook = board.get_piece_by_position(castling_info['rook'])
+            if isinstance(king, King) and isinstance(rook, Rook):
+                king.can_castle = True
+                rook.can_castle = True
+        board.castling = board.castling_rights()
+
+        if en_passant != '-':
+            board.set_en_passant(board.next_move_color, notation_to_move(en_passant)[1])
+
+        if len(fields) >= 6:
+            board.halfmove_clock = int(fields[4])
+            board.fullmove_number = int(fields[5])
+
+        return board
+
+    def to_fen(self):
+        ranks = []
+        for rank in range(7, -1, -1):
+            rank_string = ''
+            empty = 0
+            for file in range(8):
+                piece = self.squares[rank * 8 + file]
+                if piece is None:
+                    empty += 1
+                    continue
+
+                if empty:
+                    rank_string += str(empty)
+                    empty = 0
+                rank_string += piece.rep()
+
+            if empty:
+                rank_string += str(empty)
+            ranks.append(rank_string)
+
+        rights = self.castling_rights()
+        castling = ''.join(char for bit, char in [(1, 'K'), (0, 'Q'), (3, 'k'), (2, 'q')] if rights & 1 << bit) or '-'
+
+        en_passant = '-'
+        if True in self.en_passant[self.next_move_color]:
+            file = self.en_passant[self.next_move_color].index(True)
+            en_passant = move_to_notation((5 if self.next_move_color == 'white' else 2, file))
+
+        return ' '.join(['/'.join(ranks), self.next_move_color[0], castling, en_passant, str(self.halfmove_clock), str(self.fullmove_number)])
+
+    def move_to_san(self, move):
+        # Standard algebraic notation of a legal move of the side to move
+        if move.special_move == 'castling':
+            san = 'O-O' if move.target[1] == 6 else 'O-O-O'
+        else:
+            piece = self.get_piece_by_position(move.origin)
+            if isinstance(piece, Pawn):
+                san = 'abcdefgh'[move.origin[1]] + 'x' if move.is_capture else ''
+            else:
+                san = piece.char.upper()
+
+                # Disambiguate between pieces of the same kind that can go to
+                # the same square, by file if possible, else by rank
+                others = [other.origin for other in self.get_move_list_for_color(piece.color) if other.target == move.target and other.origin != move.origin and type(self.get_piece_by_position(other.origin)) is type(piece)]
+                if others:
+                    if all(origin[1] != move.origin[1] for origin in others):
+                        san += 'abcdefgh'[move.origin[1]]
+                    elif all(origin[0] != move.origin[0] for origin in others):
+                        san += str(move.origin[0] + 1)
+                    else:
+                        san += move_to_notation(move.origin)
+
+                if move.is_capture:
+                    san += 'x'
+
+            san += move_to_notation(move.target)
+            if move.special_move == 'promotion':
+                san += '=Q'
+
+        self.make_move(move)
+        if self.is_checked(self.next_move_color):
+            san += '+' if self.get_move_list_for_color(self.next_move_color) else '#'
+        self.unmake_move()
+
+        return san
+
+    def san_to_move(self, san):
+        # The legal move with the given standard algebraic notation, or None
+        san = san.rstrip('+#!?')
+        for move in self.get_move_list_for_color(self.next_move_color):
+            if self.move_to_san(move).rstrip('+#') == san:
+                return move
+
+        return None
+
+    def smith_to_move(self, notation):
+        # The legal move in Smith notation (e.g. g1f3 or e7e8q), or None. Only
+        # queen promotions exist, so any promotion piece selects it.
+        origin = notation_to_move(notation[:2])
+        target = notation_to_move(notation[2:4])
+        for move in self.get_move_list_for_color(self.next_move_color):
+            if move.origin == origin and move.target == target:
+                return move
+
+        return None
+
+    def copy(self):
         new_board = Board()
         for piece in self.pieces:
             piece.copy_to_board(new_board)
-        new_board.last_move = move
-        new_board.next_move_color = opposite_color(self.next_move_color)
+        new_board.next_move_color = self.next_move_color
+        new_board.last_move = self.last_move
+        new_board.move_generator = self.move_generator
+        new_board.legality_check = self.legality_check
+        new_board.pawn_table = self.pawn_table
+        new_board.en_passant = self.en_passant
+        new_board.halfmove_clock = self.halfmove_clock
+        new_board.fullmove_number = self.fullmove_number
 
-        if not move.special_move:
-            # Maybe remove an existing enemy piece
-            if move.is_capture:
-                new_board.remove_piece_by_position(move.target)
-            
-            # Find the piece that should be moved
-            piece = new_board.get_piece_by_position(move.origin)
-            piece.move_piece(move.target)
-            
-        elif move.special_move == 'pawn_double':
-            piece = new_board.get_piece_by_position(move.origin)
+        return new_board
+
+    def copy_and_execute_move(self, move):
+        new_board = self.copy()
+        new_board.make_move(move)
+
+        return new_board
+
+    def make_move(self, move):
+        piece = self.squares[square_index(move.origin)]
+        if move.special_move == 'en_passant':
+            captured = self.get_piece_by_position((move.origin[0], move.target[1]))
+        elif move.is_capture:
+            captured = self.squares[square_index(move.target)]
+        else:
+            captured = None
+
+        # No later position can repeat the one before a capture or pawn move,
+        # so is_repetition never reads its key
+        irreversible = captured is not None or isinstance(piece, Pawn)
+        key = None if irreversible else self.zobrist_key()
+        self.history.append(Undo(piece, captured, getattr(piece, 'can_castle', False), self.en_passant, self.last_move, self.halfmove_clock, self.castling, key))
+        self.last_move = move
+        if self.next_move_color == 'black':
+            self.fullmove_number += 1
+        self.next_move_color = opposite_color(self.next_move_color)
+        self.reset_en_passant()
+
+        if irreversible:
+            self.halfmove_clock = 0
+        else:
+            self.halfmove_clock += 1
+
+        if captured is not None:
+            self.remove_piece(captured)
+
+        if move.special_move == 'castling':
+            piece.move_piece(move.move_info['king_move'][1])
+            rook = self.get_piece_by_position(move.move_info['rook_move'][0])
+            rook.move_piece(move.move_info['rook_move'][1])
+
+        elif move.special_move == 'promotion':
+            self.remove_piece(piece)
+            Queen(self, move.target, piece.color)
+
+        else:
             piece.move_piece(move.target)
-            
-            new_board.en_passant[opposite_color(piece.color)][move.origin[1]] = True
+
+            if move.special_move == 'pawn_double':
+                self.set_en_passant(opposite_color(piece.color), move.origin[1])
+
+    def make_null_move(self):
+        # Pass the move to the opponent, for null move pruning. Taken back
+        # with unmake_move.
+        self.history.append(Undo(None, None, False, self.en_passant, self.last_move, self.halfmove_clock, self.castling, self.zobrist_key()))
+        self.last_move = None
+        if self.next_move_color == 'black':
+            self.fullmove_number += 1
+        self.next_move_color = opposite_color(self.next_move_color)
+        self.reset_en_passant()
+        self.halfmove_clock += 1
+
+    def unmake_move(self):
+        move = self.last_move
+        undo = self.history.pop()
+        piece = undo.piece
+
+        if piece is None:
+            # A null move only passed the move
+            pass
 
         elif move.special_move == 'castling':
-            king = new_board.get_piece_by_position(move.move_info['king_move'][0])
-            king.move_piece(move.move_info['king_move'][1])
-            
-            rook = new_board.get_piece_by_position(move.move_info['rook_move'][0])
-            rook.move_piece(move.move_info['rook_move'][1])
-            
-        elif move.special_move == 'en_passant':
-            pawn = new_board.get_piece_by_position(move.origin)
-            pawn.move_piece(move.target)
-            
-            # remove the captured pawn
-            new_board.remove_piece_by_position((move.origin[0], move.target[1]))
-        
+            self.relocate_piece(piece, move.move_info['king_move'][0])
+            piece.can_castle = True
+            rook = self.get_piece_by_position(move.move_info['rook_move'][1])
+            self.relocate_piece(rook, move.move_info['rook_move'][0])
+            rook.can_castle = True
+
         elif move.special_move == 'promotion':
-            pawn = new_board.get_piece_by_position(move.origin)
-            color = pawn.color
-            
-            new_board.remove_piece_by_position(move.origin)
-            Queen(new_board, move.target, color)
+            # The pawn was taken off the board without moving it, so it can be
+            # put back as it is.
+            self.remove_piece(self.get_piece_by_position(move.target))
+            self.add_piece(piece)
 
-        return new_board
-    
-    def evaluate(self, depth = 0, α = -INFINITY, β = INFINITY):
-        board_evaluation = sum(piece.evaluate() for piece in self.pieces)
+        else:
+            self.relocate_piece(piece, move.origin)
+            if isinstance(piece, CastlePiece):
+                piece.can_castle = undo.can_castle
+
+        if undo.captured is not None:
+            self.add_piece(undo.captured)
+
+        self.last_move = undo.last_move
+        self.en_passant = undo.en_passant
+        self.halfmove_clock = undo.halfmove_clock
+        self.castling = undo.castling
+        self.next_move_color = opposite_color(self.next_move_color)
+        if self.next_move_color == 'black':
+            self.fullmove_number -= 1
+
+    def evaluate_without_moves(self):
+        # Value of a position where the side to move has no legal move: lost
+        # if checkmated, as if the king was captured two plies later like in
+        # the search, else a stalemate draw
+        return mate_value(-1, 2) if self.is_checked(self.next_move_color) else DRAW_VALUE
+
+    def is_repetition(self, count = 1, key = None):
+        # Whether the position occurred count times before. Only the positions
+        # since the last capture or pawn move can be the same, and a null move
+        # ends the comparison as the positions before it were not really played.
+        if key is None:
+            key = self.zobrist_key()
+        history = self.history
+        occurrences = 0
+        for index in range(len(history) - 1, max(len(history) - self.halfmove_clock, 0) - 1, -1):
+            undo = history[index]
+            if undo.piece is None:
+                break
+            if (len(history) - index) % 2 == 0 and undo.key == key:
+                occurrences += 1
+                if occurrences >= count:
+                    return True
+
+        return False
+
+    def is_fifty_move_draw(self):
+        return self.halfmove_clock >= 100
+
+    def is_draw(self, key = None):
+        # Draw by repetition or the fifty-move rule, as the search scores it
+        return self.is_fifty_move_draw() or self.is_repetition(1, key)
+
+    def evaluate(self, depth = 0, α = -INFINITY, β = INFINITY, transposition_table = None):
+        board_evaluation = self.evaluate_static()
 
         if depth == 0 or board_evaluation > MATE_THRESHOLD or board_evaluation < -MATE_THRESHOLD:
             return { 'value': board_evaluation, 'move': self.last_move }
-        
-        value = -INFINITY
-        best_move = None
-        for move in self.get_moves_for_color(self.next_move_color, False):
-            evaluation = move.evaluate(depth - 1, α = -β, β = -α)
-            if -evaluation['value'] > value:
-                value = -evaluation['value']
-                best_move = move
-            α = max(α, value)
-            if α >= β:
-                break
-        
-        # Draw detection (No move, but mate threshold not exceeded)
-        if best_move is None:
-            return { 'value': 0, 'move': None }
-            
-        return { 'value': value, 'move': best_move.last_move }
+
+        search = Search(self, transposition_table)
+        return search.measure(search.search_root, depth, α, β)
+
+    def iterative_deepening(self, time_limit = None, max_depth = MAX_DEPTH, transposition_table = None, callback = None, stop_event = None):
+        search = Search(self, transposition_table)
+        search.stop_event = stop_event
+        return search.measure(search.iterative_deepening, time_limit, max_depth, callback)
+
+    def static_exchange_evaluation(self, move):
+        # Material won by the side making the capture, when both sides keep
+        # recapturing on the target square with their least valuable piece
+        # as long as it pays off.
+        victim = self.get_piece_by_position((move.origin[0], move.target[1])) if move.special_move == 'en_passant' else self.get_piece_by_position(move.target)
+        self.make_move(move)
+        value = victim.value - self.exchange_value(move.target)
+        self.unmake_move()
+
+        return value
+
+    def exchange_value(self, position):
+        captures = [move for move in self.get_move_list_for_color(self.next_move_color, False) if move.target == position and move.is_capture]
+        if not captures:
+            return 0
+
+        capture = min(captures, key = lambda move: self.get_piece_by_position(move.origin).value)
+        victim = self.get_piece_by_position(position)
+        self.make_move(capture)
+        value = max(0, victim.value - self.exchange_value(position))
+        self.unmake_move()
+
+        return value
+
+    def evaluate_static(self):
+        # Material, piece-square and pawn structure score from the point of
+        # view of the side to move, as negamax expects.
+        if DEBUG_EVALUATION:
+            assert self.score == self.evaluate_full(), 'Incremental evaluation out of sync'
+
+        score = self.score
+        if PAWN_STRUCTURE:
+            score += self.pawn_structure_score()
+
+        return score if self.next_move_color == 'white' else -score
+
+    def pawn_structure_score(self):
+        # Pawn structure score from white's point of view, from the pawn hash
+        # table if the pawns were seen before
+        table = self.pawn_table
+        if table is not None:
+            score = table.probe(self.pawn_hash)
+            if score is not None:
+                return score
+
+        pawns = {'white': [], 'black': []}
+        for piece in self.pieces:
+            if piece.char == 'p':
+                pawns[piece.color].append(piece.position)
+        score = evaluate_pawn_structure(pawns['white'], pawns['black'])
+
+        if table is not None:
+            table.store(self.pawn_hash, score)
+
+        return score
+
+    def evaluate_full(self):
+        # Recompute the score that is kept incrementally in self.score
+        return sum(piece.evaluate() for piece in self.pieces)
 
 class Piece:
+    # Value, char and piece-square table are class attributes
+    __slots__ = ('board', 'position', 'color')
+
     def __init__(self, board, position, color):
         self.board = board
         self.position = position
         self.color = color
         
         # Add the piece to the board
-        self.board.pieces.append(self)
+        self.board.add_piece(self)
     
     def rep(self):
         if self.color == 'white':
@@ -219,22 +1025,18 @@ class Piece:
             return self.char
 
     def move_piece(self, target_position):
-        self.position = target_position
+        self.board.relocate_piece(self, target_position)
     
     def generate_moves(self, verify_no_check = True):
-        for new_board in self.generate_pseudo_legal_moves():
-            # If there is a check, the move can not be used
-            if verify_no_check and new_board.is_checked(self.color):
-                continue
-            
-            if new_board.last_move.special_move == 'castling':
-                no_check_on_path = all(not new_board.is_attacked(position, self.color) for position in new_board.last_move.move_info['king_path'])
-                if no_check_on_path:
-                    yield new_board
-            else:
-                yield new_board
+        for move in self.board.get_move_list_for_color(self.color, verify_no_check):
+            if move.origin == self.position:
+                yield self.board.copy_and_execute_move(move)
     
     def generate_pseudo_legal_moves(self):
+        for move in self.pseudo_legal_moves():
+            yield self.board.copy_and_execute_move(move)
+
+    def pseudo_legal_moves(self):
         for pattern in self.move_patterns:
             target_position = add_pattern_to_position(self.position, pattern)
             
@@ -243,8 +1045,7 @@ class Piece:
                 
                 # No piece on the target square, we can move there
                 if target_piece is None:
-                    move = Move(self.position, target_position)
-                    yield self.board.copy_and_execute_move(move)
+                    yield Move(self.position, target_position)
                     
                 # If we bump into a same color piece we can neither capture nor
                 # move further.
@@ -252,8 +1053,7 @@ class Piece:
                     break
                 else:
                     # We can capture but not move further
-                    move = Move(self.position, target_position, is_capture = True)
-                    yield self.board.copy_and_execute_move(move)
+                    yield Move(self.position, target_position, is_capture = True)
                     break
                 
                 # If we can't repeat the move (king, knight), break
@@ -262,6 +1062,28 @@ class Piece:
 
                 target_position = add_pattern_to_position(target_position, pattern)
 
+    def pseudo_legal_captures(self):
+        # Captures only: the first piece in every direction, if it is an
+        # opposite color piece
+        squares = self.board.squares
+        for ray in PIECE_RAYS[self.char][square_index(self.position)]:
+            for square in ray:
+                piece = squares[square]
+                if piece is not None:
+                    if piece.color != self.color:
+                        yield Move(self.position, POSITIONS[square], is_capture = True)
+                    break
+
+    def pseudo_legal_quiets(self):
+        # Non-captures only: the empty squares in every direction up to the
+        # first piece
+        squares = self.board.squares
+        for ray in PIECE_RAYS[self.char][square_index(self.position)]:
+            for square in ray:
+                if squares[square] is not None:
+                    break
+                yield Move(self.position, POSITIONS[square])
+
     def evaluate(self):
         material_value = self.value
         positional_value = self.positional_value[self.position[0] if self.color == 'white' else 7 - self.position[0]][self.position[1]]
@@ -273,18 +1095,24 @@ class Piece:
         return self.__class__(board, self.position, self.color)
 
 class CastlePiece(Piece):
+    __slots__ = ('can_castle',)
+
     def __init__(self, board, position, color, can_castle = True):
         self.can_castle = can_castle
         super().__init__(board, position, color)
     
     def move_piece(self, target_position):
-        self.can_castle = False
         super().move_piece(target_position)
+        if self.can_castle:
+            self.can_castle = False
+            self.board.castling = self.board.castling_rights()
     
     def copy_to_board(self, board):
         return self.__class__(board, self.position, self.color, can_castle = self.can_castle)
 
 class King(CastlePiece):
+    __slots__ = ()
+
     move_patterns = MOVE_PATTERNS['straight'] + MOVE_PATTERNS['diagonal']
     repeat_move = False
     char = 'k'
@@ -300,12 +1128,25 @@ class King(CastlePiece):
         [4,  54,  47, -99, -99,  60,  83, -62]
     ]
 
-    def generate_pseudo_legal_moves(self):
+    def pseudo_legal_moves(self):
         # First try out all non-castling king moves
-        for regular_move in super().generate_pseudo_legal_moves():
+        for regular_move in super().pseudo_legal_moves():
             yield regular_move
 
-        if self.can_castle:
+        for castling_move in self.castling_moves():
+            yield castling_move
+
+    def pseudo_legal_quiets(self):
+        for regular_move in super().pseudo_legal_quiets():
+            yield regular_move
+
+        for castling_move in self.castling_moves():
+            yield castling_move
+
+    def castling_moves(self):
+        # Castlings with a rook that can still castle and nothing in the way,
+        # without checking for attacked squares
+        if self.can_castle and self.position == CASTLING[self.color][0]['king_move'][0]:
             for castling in CASTLING[self.color]:
                 # Find out if there is a rook to castle with
                 maybe_rook = self.board.get_piece_by_position(castling['rook'])
@@ -315,11 +1156,12 @@ class King(CastlePiece):
                 nothing_in_way = all(self.board.get_piece_by_position(position) is None for position in castling['free_fields'])
                 
                 if rook_can_castle and nothing_in_way:
-                    move = Move(*castling['king_move'], special_move = 'castling', move_info = castling)
-                    yield self.board.copy_and_execute_move(move)
+                    yield Move(*castling['king_move'], special_move = 'castling', move_info = castling)
 
 
 class Queen(Piece):
+    __slots__ = ()
+
     move_patterns = MOVE_PATTERNS['straight'] + MOVE_PATTERNS['diagonal']
     repeat_move = True
     char = 'q'
@@ -336,6 +1178,8 @@ class Queen(Piece):
     ]
 
 class Rook(CastlePiece):
+    __slots__ = ()
+
     move_patterns = MOVE_PATTERNS['straight']
     repeat_move = True
     char = 'r'
@@ -352,6 +1196,8 @@ class Rook(CastlePiece):
     ]
     
 class Bishop(Piece):
+    __slots__ = ()
+
     move_patterns = MOVE_PATTERNS['diagonal']
     repeat_move = True
     char = 'b'
@@ -368,6 +1214,8 @@ class Bishop(Piece):
     ]
     
 class Knight(Piece):
+    __slots__ = ()
+
     move_patterns = MOVE_PATTERNS['knight']
     repeat_move = False
     char = 'n'
@@ -384,6 +1232,8 @@ class Knight(Piece):
     ]
 
 class Pawn(Piece):
+    __slots__ = ()
+
     char = 'p'
     value = 100
     positional_value = [
@@ -397,7 +1247,18 @@ class Pawn(Piece):
         [0,   0,   0,   0,   0,   0,   0,   0]
     ]
 
-    def generate_pseudo_legal_moves(self):
+    def pseudo_legal_captures(self):
+        # Pawn moves are few, so filter them
+        for move in self.pseudo_legal_moves():
+            if move.is_capture or move.special_move == 'promotion':
+                yield move
+
+    def pseudo_legal_quiets(self):
+        for move in self.pseudo_legal_moves():
+            if not move.is_capture and move.special_move != 'promotion':
+                yield move
+
+    def pseudo_legal_moves(self):
         patterns = MOVE_PATTERNS['pawn'][self.color]
         promotion = self.color == 'white' and self.position[0] == FILES[7] or self.color == 'black' and self.position[0] == FILES[2]
         
@@ -405,16 +1266,14 @@ class Pawn(Piece):
         target_position = add_pattern_to_position(self.position, patterns['move'])
         target_piece = self.board.get_piece_by_position(target_position)
         if target_piece is None:
-            move = Move(self.position, target_position, special_move = ('promotion' if promotion else False))
-            yield self.board.copy_and_execute_move(move)
+            yield Move(self.position, target_position, special_move = ('promotion' if promotion else False))
         
             # Pawn double move
             if self.color == 'white' and self.position[0] == FILES[2] or self.color == 'black' and self.position[0] == FILES[7]:
                 target_position = add_pattern_to_position(self.position, patterns['double_move'])
                 target_piece = self.board.get_piece_by_position(target_position)
                 if target_piece is None:
-                    move = Move(self.position, target_position, special_move='pawn_double')
-                    yield self.board.copy_and_execute_move(move)
+                    yield Move(self.position, target_position, special_move='pawn_double')
         
         # Pawn attack
         for attack_pattern in patterns['attack']:
@@ -423,16 +1282,755 @@ class Pawn(Piece):
             
             # No need to check if target position is on board, because if not there is no piece there
             if target_piece is not None and target_piece.color == opposite_color(self.color):
-                move = Move(self.position, target_position, special_move = ('promotion' if promotion else False), is_capture = True)
-                yield self.board.copy_and_execute_move(move)
+                yield Move(self.position, target_position, special_move = ('promotion' if promotion else False), is_capture = True)
             
             # Check if we can capture en passant
             if is_on_board(target_position) and self.board.en_passant[self.color][target_position[1]]:
                 if self.position[0] == FILES[5] and self.color == 'white' or self.position[0] == FILES[4] and self.color == 'black':
-                    move = Move(self.position, target_position, special_move = 'en_passant', is_capture = True)
-                    yield self.board.copy_and_execute_move(move)
+                    yield Move(self.position, target_position, special_move = 'en_passant', is_capture = True)
         
+class TranspositionTable:
+    def __init__(self, size_mb = None, replacement = None):
+        size_mb = HASH_SIZE_MB if size_mb is None else size_mb
+        self.replacement = TT_REPLACEMENT if replacement is None else replacement
+
+        # Use a power of two number of entries so the index is a simple mask
+        entry_count = 1
+        while entry_count * 2 * TT_ENTRY_SIZE <= size_mb * 1024 * 1024:
+            entry_count *= 2
+
+        self.mask = entry_count - 1
+        self.entries = [None] * entry_count
+        self.generation = 0
+        self.probes = 0
+        self.hits = 0
+
+    def new_search(self):
+        self.generation += 1
+
+    def clear(self):
+        self.entries = [None] * len(self.entries)
+
+    def probe(self, key):
+        self.probes += 1
+        entry = self.entries[key & self.mask]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+
+        return None
+
+    def store(self, key, depth, bound, value, move):
+        index = key & self.mask
+        entry = self.entries[index]
+        if self.replacement == 'depth' and entry is not None and entry[0] != key and entry[5] == self.generation and entry[1] > depth:
+            return
+
+        self.entries[index] = (key, depth, bound, value, move, self.generation)
+
+class PawnTable:
+    # Pawn structure scores by pawn key. Entries are always replaced, as the
+    # score of a pawn structure does not depend on the search.
+    def __init__(self, size_mb = None):
+        size_mb = PAWN_HASH_SIZE_MB if size_mb is None else size_mb
+        entry_count = 1
+        while entry_count * 2 * PAWN_ENTRY_SIZE <= size_mb * 1024 * 1024:
+            entry_count *= 2
+
+        self.mask = entry_count - 1
+        self.entries = [None] * entry_count
+        self.probes = 0
+        self.hits = 0
+
+    def clear(self):
+        self.entries = [None] * len(self.entries)
+
+    def probe(self, key):
+        self.probes += 1
+        entry = self.entries[key & self.mask]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry[1]
+
+        return None
+
+    def store(self, key, score):
+        self.entries[key & self.mask] = (key, score)
+
+# Pawn table of all boards unless they are given their own
+default_pawn_table = PawnTable()
+
+class SharedTranspositionTable:
+    # Transposition table in a block of shared memory, which search processes
+    # can read and write at the same time. Writes take no lock: an entry torn
+    # by two processes writing at once no longer verifies against its key and
+    # reads as a miss.
+    def __init__(self, size_mb = None, replacement = None, name = None):
+        self.replacement = TT_REPLACEMENT if replacement is None else replacement
+        self.owner = name is None
+        if self.owner:
+            size_mb = SHARED_HASH_SIZE_MB if size_mb is None else size_mb
+            entry_count = 1
+            while entry_count * 2 * SHARED_TT_ENTRY_SIZE <= size_mb * 1024 * 1024:
+                entry_count *= 2
+
+            # One more slot in front of the entries holds the generation
+            self.memory = shared_memory.SharedMemory(create = True, size = (entry_count + 1) * SHARED_TT_ENTRY_SIZE)
+        else:
+            self.memory = shared_memory.SharedMemory(name)
+            entry_count = 1
+            while entry_count * 2 + 1 <= self.memory.size // SHARED_TT_ENTRY_SIZE:
+                entry_count *= 2
+
+        self.name = self.memory.name
+        self.words = self.memory.buf.cast('Q')
+        self.mask = entry_count - 1
+        self.probes = 0
+        self.hits = 0
+
+    @classmethod
+    def attach(cls, name, replacement = None):
+        # Attach to the table of another program. Only the creator unlinks
+        # the shared memory, so it is not left to this process' resource
+        # tracker. Child processes of the creator inherit or unpickle the
+        # table instead.
+        table = cls(replacement = replacement, name = name)
+        resource_tracker.unregister(table.memory._name, 'shared_memory')
+        return table
+
+    def __getstate__(self):
+        return { 'name': self.name, 'replacement': self.replacement }
+
+    def __setstate__(self, state):
+        self.__init__(replacement = state['replacement'], name = state['name'])
+
+    def close(self):
+        self.words.release()
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+    @property
+    def generation(self):
+        return self.words[0]
+
+    @generation.setter
+    def generation(self, generation):
+        self.words[0] = generation & 0xff
+
+    def new_search(self):
+        self.generation += 1
+
+    def clear(self):
+        self.memory.buf[SHARED_TT_ENTRY_SIZE:] = bytes(len(self.memory.buf) - SHARED_TT_ENTRY_SIZE)
+
+    def probe(self, key):
+        self.probes += 1
+        index = 2 * (key & self.mask) + 2
+        data = self.words[index + 1]
+        if self.words[index] ^ data != key:
+            return None
+
+        self.hits += 1
+        return (key,) + unpack_entry(data)
+
+    def store(self, key, depth, bound, value, move):
+        index = 2 * (key & self.mask) + 2
+        generation = self.generation
+        if self.replacement == 'depth':
+            entry_data = self.words[index + 1]
+            entry_key = self.words[index] ^ entry_data
+            entry_depth, entry_bound, entry_value, entry_move, entry_generation = unpack_entry(entry_data)
+            if entry_data and entry_key != key and entry_generation == generation and entry_depth > depth:
+                return
+
+        data = pack_entry(depth, bound, value, move, generation)
+        self.words[index] = key ^ data
+        self.words[index + 1] = data
+
+class Instrumentation:
+    # Calls of and time spent in the board methods that take most of the
+    # search time. The methods are only wrapped with timers while enabled.
+    # Times include nested calls, e.g. move generation checking castling
+    # paths with is_attacked. Move generation is split into the full move
+    # lists, the capture and quiet stages of the search and the lookup of
+    # hash and killer moves.
+    METHODS = {
+        'move_generation': 'get_move_list_for_color',
+        'capture_generation': 'get_capture_list_for_color',
+        'quiet_generation': 'get_quiet_list_for_color',
+        'move_lookup': 'find_pseudo_legal_move',
+        'attack_tests': 'is_attacked',
+        'evaluation': 'evaluate_static',
+        'make_move': 'make_move',
+        'unmake_move': 'unmake_move',
+        'board_copies': 'copy'
+    }
+
+    def __init__(self):
+        self.calls = dict.fromkeys(self.METHODS, 0)
+        self.times = dict.fromkeys(self.METHODS, 0.0)
+        self.originals = {}
+
+    def enable(self):
+        for name, method_name in self.METHODS.items():
+            self.originals[name] = Board.__dict__[method_name]
+            setattr(Board, method_name, self.timed(name, self.originals[name]))
+
+    def disable(self):
+        for name, method_name in self.METHODS.items():
+            setattr(Board, method_name, self.originals.pop(name))
+
+    def timed(self, name, method):
+        calls = self.calls
+        times = self.times
+        perf_counter = time.perf_counter
+
+        def timed_method(*arguments, **keywords):
+            calls[name] += 1
+            start = perf_counter()
+            try:
+                return method(*arguments, **keywords)
+            finally:
+                times[name] += perf_counter() - start
+
+        return timed_method
+
+    def report(self):
+        return { name: { 'calls': self.calls[name], 'time': round(self.times[name], 4) } for name in self.METHODS }
+
+def profile_report(profiler, functions):
+    # The functions that took the most time of their own
+    statistics = pstats.Stats(profiler).stats
+    report = []
+    for (file_name, line, function), (primitive_calls, calls, total_time, cumulative_time, callers) in statistics.items():
+        report.append({ 'function': '%s:%d(%s)' % (file_name, line, function), 'calls': calls, 'time': round(total_time, 4), 'cumulative': round(cumulative_time, 4) })
+
+    return sorted(report, key = lambda entry: entry['time'], reverse = True)[:functions]
+
+class SearchTimeout(Exception):
+    pass
+
+class Search:
+    def __init__(self, board, transposition_table = None):
+        self.board = board
+        self.transposition_table = TranspositionTable() if transposition_table is None else transposition_table
+        self.transposition_table.new_search()
+        self.deadline = None
+        self.stop_event = None
+        self.nodes = 0
+        self.best_move = None
+
+        # Move ordering state: two killer moves per ply and a history score
+        # per color and origin/target square pair
+        self.move_ordering = MOVE_ORDERING
+        self.staged_move_generation = STAGED_MOVE_GENERATION
+        self.capture_stages = 0
+        self.quiet_stages = 0
+        self.killers = [[None, None] for ply in range(MAX_DEPTH + 1)]
+        self.history = {
+            'white': [0] * 4096,
+            'black': [0] * 4096
+        }
+        self.quiescence = QUIESCENCE
+        self.delta_pruning = DELTA_PRUNING
+        self.see_pruning = SEE_PRUNING
+        self.quiescence_nodes = 0
+        self.null_move_pruning = NULL_MOVE_PRUNING
+        self.late_move_reductions = LATE_MOVE_REDUCTIONS
+        self.check_extensions = CHECK_EXTENSIONS
+        self.null_move_cutoffs = 0
+        self.reductions = 0
+        self.re_searches = 0
+        self.extensions = 0
+        self.principal_variation_search = PRINCIPAL_VARIATION_SEARCH
+        self.aspiration_window = ASPIRATION_WINDOW
+        self.pvs_re_searches = 0
+        self.aspiration_re_searches = 0
+        self.draw_detection = DRAW_DETECTION
+        self.draws = 0
+
+        # Best line found from every ply, built up from the line of the next ply
+        self.principal_variation = [[] for ply in range(MAX_DEPTH + 2)]
+
+        # Beta cutoffs, and how many of them happened on the first move
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+        # Measurement of the search, see measure. The profiler can be any
+        # object with enable and disable methods, e.g. a tracer.
+        self.time = 0
+        self.table_probes = self.transposition_table.probes
+        self.table_hits = self.transposition_table.hits
+        self.pawn_table = board.pawn_table
+        self.pawn_probes = self.pawn_table.probes if self.pawn_table is not None else 0
+        self.pawn_hits = self.pawn_table.hits if self.pawn_table is not None else 0
+        self.instrumentation = Instrumentation() if INSTRUMENTATION else None
+        self.profiler = cProfile.Profile() if PROFILE_SEARCH else None
+        self.statistics_file = STATISTICS_FILE
+
+    def first_move_cutoff_rate(self):
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0
+
+    def measure(self, search_function, *arguments):
+        # Run a search function with the instrumentation and profiler, add the
+        # statistics to its result and append them to the statistics file
+        fen = self.board.to_fen()
+        if self.instrumentation is not None:
+            self.instrumentation.enable()
+        if self.profiler is not None:
+            self.profiler.enable()
+        start = time.perf_counter()
+        try:
+            result = search_function(*arguments)
+        finally:
+            self.time += time.perf_counter() - start
+            if self.profiler is not None:
+                self.profiler.disable()
+            if self.instrumentation is not None:
+                self.instrumentation.disable()
+
+        if result is not None:
+            result['statistics'] = self.statistics()
+            if self.statistics_file is not None:
+                with open(self.statistics_file, 'a') as statistics_file:
+                    record = { 'fen': fen, 'move': move_to_smith(result['move']) if result['move'] is not None else None, 'value': result['value'], 'depth': result.get('depth'), 'statistics': result['statistics'] }
+                    statistics_file.write(json.dumps(record) + '\n')
+
+        return result
+
+    def statistics(self):
+        table = self.transposition_table
+        probes = table.probes - self.table_probes
+        hits = table.hits - self.table_hits
+        statistics = {
+            'nodes': self.nodes,
+            'quiescence_nodes': self.quiescence_nodes,
+            'time': round(self.time, 4),
+            'nps': int(self.nodes / self.time) if self.time else 0,
+            'cutoffs': self.cutoffs,
+            'first_move_cutoff_rate': round(self.first_move_cutoff_rate(), 4),
+            'tt_probes': probes,
+            'tt_hits': hits,
+            'tt_hit_rate': round(hits / probes, 4) if probes else 0,
+            'null_move_cutoffs': self.null_move_cutoffs,
+            'reductions': self.reductions,
+            're_searches': self.re_searches,
+            'extensions': self.extensions,
+            'pvs_re_searches': self.pvs_re_searches,
+            'aspiration_re_searches': self.aspiration_re_searches,
+            'draws': self.draws,
+            'capture_stages': self.capture_stages,
+            'quiet_stages': self.quiet_stages
+        }
+        if self.pawn_table is not None:
+            pawn_probes = self.pawn_table.probes - self.pawn_probes
+            pawn_hits = self.pawn_table.hits - self.pawn_hits
+            statistics['pawn_probes'] = pawn_probes
+            statistics['pawn_hits'] = pawn_hits
+            statistics['pawn_hit_rate'] = round(pawn_hits / pawn_probes, 4) if pawn_probes else 0
+        if self.instrumentation is not None:
+            statistics['functions'] = self.instrumentation.report()
+        if isinstance(self.profiler, cProfile.Profile):
+            statistics['profile'] = profile_report(self.profiler, PROFILE_FUNCTIONS)
+
+        return statistics
+
+    def order_moves(self, moves, hash_move, ply):
+        # Sort moves by the hash move first, then captures by most valuable
+        # victim / least valuable attacker and promotions, then killer moves
+        # and the rest by history score.
+        if self.move_ordering:
+            squares = self.board.squares
+            killers = self.killers[ply]
+            history = self.history[self.board.next_move_color]
+
+            def score(move):
+                if move == hash_move:
+                    return HASH_MOVE_SCORE
+
+                origin_index = square_index(move.origin)
+                target_index = square_index(move.target)
+                if move.is_capture or move.special_move == 'promotion':
+                    capture_score = CAPTURE_SCORE
+                    if move.is_capture:
+                        victim = squares[target_index] if move.special_move != 'en_passant' else Pawn
+                        capture_score += 10 * victim.value - squares[origin_index].value
+                    if move.special_move == 'promotion':
+                        capture_score += 10 * Queen.value
+                    return capture_score
+
+                if move == killers[0] or move == killers[1]:
+                    return KILLER_SCORE
+
+                return history[origin_index * 64 + target_index]
+
+            moves.sort(key = score, reverse = True)
+
+        elif hash_move is not None and hash_move in moves:
+            # Move the generated move rather than the hash move, which may be
+            # an equal move unpacked from a table
+            moves.insert(0, moves.pop(moves.index(hash_move)))
+
+    def staged_moves(self, hash_move, ply):
+        # Moves in the order of order_moves, generated in stages: the hash
+        # move, captures and promotions, killer moves and the quiet moves. A
+        # stage is only generated when the search gets to it. Between moves
+        # the board is back in the position of the node.
+        board = self.board
+        color = board.next_move_color
+        if hash_move is not None:
+            hash_move = board.find_pseudo_legal_move(hash_move)
+            if hash_move is not None:
+                yield hash_move
+
+        self.capture_stages += 1
+        captures = board.get_capture_list_for_color(color)
+        self.order_moves(captures, None, ply)
+        for move in captures:
+            if move != hash_move:
+                yield move
+
+        killers = []
+        for killer in list(self.killers[ply]):
+            if killer is not None and killer != hash_move:
+                killer = board.find_pseudo_legal_move(killer)
+                if killer is not None and not killer.is_capture and killer.special_move != 'promotion':
+                    killers.append(killer)
+                    yield killer
+
+        self.quiet_stages += 1
+        quiets = board.get_quiet_list_for_color(color)
+        self.order_moves(quiets, None, ply)
+        for move in quiets:
+            if move != hash_move and move not in killers:
+                yield move
+
+    def record_cutoff(self, move, move_number, depth, ply):
+        self.cutoffs += 1
+        if move_number == 0:
+            self.first_move_cutoffs += 1
+
+        # Quiet moves causing a cutoff are remembered as killers for this ply
+        # and rewarded in the history table
+        if not move.is_capture and move.special_move != 'promotion':
+            killers = self.killers[ply]
+            if move != killers[0]:
+                killers[1] = killers[0]
+                killers[0] = move
+
+            history = self.history[self.board.next_move_color]
+            index = square_index(move.origin) * 64 + square_index(move.target)
+            history[index] = min(history[index] + depth * depth, HISTORY_MAX)
+
+    def iterative_deepening(self, time_limit = None, max_depth = MAX_DEPTH, callback = None):
+        # Search with increasing depth until the time is used up or the stop
+        # event is set. The result of the deepest completed iteration is
+        # returned, with its depth (None if stopped during the first one).
+        start = time.time()
+        root_history_length = len(self.board.history)
+        result = None
+
+        for depth in range(1, max_depth + 1):
+            # The first iteration always completes, so there is a move to play
+            if time_limit is not None and result is not None:
+                self.deadline = start + time_limit
+            if self.stop_event is not None and self.stop_event.is_set():
+                break
+
+            try:
+                if self.aspiration_window is not None and result is not None and abs(result['value']) < MATE_THRESHOLD:
+                    evaluation = self.aspiration_search(depth, result['value'])
+                else:
+                    evaluation = self.search_root(depth)
+            except SearchTimeout:
+                while len(self.board.history) > root_history_length:
+                    self.board.unmake_move()
+                break
+
+            result = { 'value': evaluation['value'], 'move': evaluation['move'], 'pv': evaluation['pv'], 'depth': depth, 'nodes': self.nodes, 'time': time.time() - start }
+            if callback is not None:
+                callback(result)
+
+            # No move or a forced mate found, searching deeper will not help
+            if evaluation['move'] is None or abs(evaluation['value']) > MATE_THRESHOLD:
+                break
+
+            # The next iteration takes several times longer than this one, so
+            # do not start it if it can not finish in time.
+            if time_limit is not None and time.time() - start > time_limit * ITERATION_TIME_FRACTION:
+                break
+
+        return result
+
+    def aspiration_search(self, depth, previous_value):
+        # Search a window around the score of the previous iteration, and open
+        # it up on the side the score falls out of
+        α = previous_value - self.aspiration_window
+        β = previous_value + self.aspiration_window
+        while True:
+            evaluation = self.search_root(depth, α, β)
+            if evaluation['value'] <= α:
+                α = -INFINITY
+            elif evaluation['value'] >= β:
+                β = INFINITY
+            else:
+                return evaluation
+
+            self.aspiration_re_searches += 1
+
+    def search_root(self, depth, α = -INFINITY, β = INFINITY):
+        board = self.board
+        α_original = α
+        self.principal_variation[0] = []
+        # Legal moves only at the root, so the move played is never one that
+        # leaves the king in check even if every move loses
+        moves = board.get_move_list_for_color(board.next_move_color)
+
+        # Search the best move of the previous iteration first, or else the
+        # move stored in the transposition table
+        entry = self.transposition_table.probe(board.zobrist_key())
+        first_move = self.best_move if self.best_move is not None else entry[4] if entry is not None else None
+        self.order_moves(moves, first_move, 0)
+        
+        value = -INFINITY
+        best_move = None
+        for move_number, move in enumerate(moves):
+            board.make_move(move)
+            if move_number > 0 and self.principal_variation_search:
+                move_value = -self.negamax(depth - 1, -α - 1, -α, 1)
+                if α < move_value < β:
+                    self.pvs_re_searches += 1
+                    move_value = -self.negamax(depth - 1, -β, -α, 1)
+            else:
+                move_value = -self.negamax(depth - 1, -β, -α, 1)
+            board.unmake_move()
+
+            if move_value > value:
+                value = move_value
+                best_move = move
+            if move_value > α:
+                self.principal_variation[0] = [move] + self.principal_variation[1]
+            α = max(α, value)
+            if α >= β:
+                self.record_cutoff(move, move_number, depth, 0)
+                break
+        
+        if best_move is None:
+            return { 'value': board.evaluate_without_moves(), 'move': None, 'pv': [] }
+
+        self.best_move = best_move
+        self.transposition_table.store(board.zobrist_key(), depth, bound_type(value, α_original, β), value, best_move)
+            
+        return { 'value': value, 'move': best_move, 'pv': self.principal_variation[0] or [best_move] }
+
+    def check_time(self):
+        self.nodes += 1
+        if self.nodes % TIME_CHECK_INTERVAL == 0:
+            if self.deadline is not None and time.time() > self.deadline or self.stop_event is not None and self.stop_event.is_set():
+                raise SearchTimeout()
+
+    def negamax(self, depth, α, β, ply, null_move_allowed = True):
+        board = self.board
+        ply = min(ply, MAX_DEPTH)
+        self.principal_variation[ply] = []
+        if depth == 0 and self.quiescence:
+            return self.quiescence_search(α, β, ply)
+
+        self.check_time()
+        board_evaluation = board.evaluate_static()
+
+        if board_evaluation > MATE_THRESHOLD or board_evaluation < -MATE_THRESHOLD:
+            return mate_value(board_evaluation, ply)
+        if depth == 0:
+            return board_evaluation
+
+        key = board.zobrist_key()
+        if self.draw_detection and ply > 0 and board.is_draw(key):
+            self.draws += 1
+            return DRAW_VALUE
+
+        α_original = α
+        hash_move = None
+        entry = self.transposition_table.probe(key)
+        if entry is not None:
+            entry_key, entry_depth, bound, entry_value, hash_move, generation = entry
+            entry_value = value_from_table(entry_value, ply)
+            if entry_depth >= depth:
+                if bound == EXACT:
+                    return entry_value
+                elif bound == LOWER_BOUND:
+                    α = max(α, entry_value)
+                else:
+                    β = min(β, entry_value)
+                if α >= β:
+                    return entry_value
+
+        color = board.next_move_color
+        selective = self.null_move_pruning or self.late_move_reductions or self.check_extensions
+        in_check = selective and board.is_checked(color)
+
+        # Null move pruning: if the opponent can not reach β even when we pass,
+        # some real move will not let them either. Two null moves in a row
+        # would only cancel out.
+        if self.null_move_pruning and null_move_allowed and depth > NULL_MOVE_REDUCTION and not in_check and board_evaluation >= β and β < MATE_THRESHOLD and board.has_non_pawn_material(color):
+            board.make_null_move()
+            null_value = -self.negamax(depth - 1 - NULL_MOVE_REDUCTION, -β, -β + 1, ply + 1, False)
+            board.unmake_move()
+            if null_value >= β:
+                self.null_move_cutoffs += 1
+                return β
+
+        if self.move_ordering and self.staged_move_generation:
+            moves = self.staged_moves(hash_move, ply)
+        else:
+            moves = board.get_move_list_for_color(color, False)
+            # Search the best move of an earlier visit first
+            self.order_moves(moves, hash_move, ply)
+        killers = self.killers[ply]
+
+        value = -INFINITY
+        best_move = None
+        for move_number, move in enumerate(moves):
+            board.make_move(move)
+            extension = 0
+            reduction = 0
+            if self.check_extensions or self.late_move_reductions:
+                king = board.kings.get(board.next_move_color)
+                gives_check = king is not None and board.is_attacked(king.position, king.color)
+                # Checks given out of check are not extended, so that checks
+                # back and forth can not go on without end
+                if self.check_extensions and gives_check and not in_check:
+                    extension = 1
+                    self.extensions += 1
+                elif self.late_move_reductions and move_number >= LMR_FULL_DEPTH_MOVES and depth >= LMR_MIN_DEPTH and not in_check and not gives_check and not move.is_capture and move.special_move != 'promotion' and move != killers[0] and move != killers[1]:
+                    reduction = 1
+                    self.reductions += 1
+
+            new_depth = depth - 1 + extension
+            if move_number > 0 and (self.principal_variation_search or reduction):
+                # Expect the move to fail low and prove it with a null window,
+                # one ply less deep for a late quiet move. Search again at full
+                # depth if a reduced move beats α, and with the full window if
+                # the move lands inside it.
+                move_value = -self.negamax(new_depth - reduction, -α - 1, -α, ply + 1)
+                if reduction and move_value > α:
+                    self.re_searches += 1
+                    move_value = -self.negamax(new_depth, -α - 1, -α, ply + 1)
+                if α < move_value < β:
+                    self.pvs_re_searches += 1
+                    move_value = -self.negamax(new_depth, -β, -α, ply + 1)
+            else:
+                move_value = -self.negamax(new_depth, -β, -α, ply + 1)
+            board.unmake_move()
+
+            if move_value > value:
+                value = move_value
+                best_move = move
+            if move_value > α:
+                self.principal_variation[ply] = [move] + self.principal_variation[ply + 1]
+            α = max(α, value)
+            if α >= β:
+                self.record_cutoff(move, move_number, depth, ply)
+                break
+
+        # No pseudo-legal move at all: mated if in check, else stalemate
+        if best_move is None:
+            return mate_value(-1, ply + 2) if board.is_checked(color) else DRAW_VALUE
+
+        # Every move loses the king: a stalemate if not in check and no move
+        # is legal, not a mate
+        if value < -MATE_THRESHOLD and not board.is_checked(color) and not board.get_move_list_for_color(color):
+            value = DRAW_VALUE
+
+        self.transposition_table.store(key, depth, bound_type(value, α_original, β), value_to_table(value, ply), best_move)
+
+        return value
+
+    def quiescence_search(self, α, β, ply):
+        # Search captures and promotions only, until the position is quiet.
+        # The side to move may also stand pat with the static evaluation.
+        board = self.board
+        self.check_time()
+        self.quiescence_nodes += 1
+        stand_pat = board.evaluate_static()
+
+        if stand_pat > MATE_THRESHOLD or stand_pat < -MATE_THRESHOLD:
+            return mate_value(stand_pat, ply)
+        if stand_pat >= β:
+            return stand_pat
+
+        α = max(α, stand_pat)
+        moves = board.get_capture_list_for_color(board.next_move_color)
+        self.order_moves(moves, None, min(ply, MAX_DEPTH))
+
+        value = stand_pat
+        for move in moves:
+            # Delta pruning: skip captures that can not raise the score to α
+            # even with a safety margin. The value of a skipped capture is at
+            # most that, so it still bounds the returned value.
+            if self.delta_pruning:
+                gain = Pawn.value if move.special_move == 'en_passant' else board.get_piece_by_position(move.target).value if move.is_capture else 0
+                if move.special_move == 'promotion':
+                    gain += Queen.value - Pawn.value
+                if stand_pat + gain + DELTA_MARGIN < α:
+                    value = max(value, stand_pat + gain + DELTA_MARGIN)
+                    continue
+
+            # Skip captures that lose material in the exchange on the square
+            if self.see_pruning and move.is_capture and board.static_exchange_evaluation(move) < 0:
+                continue
+
+            board.make_move(move)
+            move_value = -self.quiescence_search(-β, -α, ply + 1)
+            board.unmake_move()
+
+            if move_value > value:
+                value = move_value
+            α = max(α, value)
+            if α >= β:
+                break
+
+        return value
+
+PIECE_CLASSES = {piece_class.char: piece_class for piece_class in [King, Queen, Rook, Bishop, Knight, Pawn]}
+
+# Translation between the board and the bitboard move generator
+BITBOARD_COLORS = {'white': bitboard.WHITE, 'black': bitboard.BLACK}
+BITBOARD_PIECES = {'p': bitboard.PAWN, 'n': bitboard.KNIGHT, 'b': bitboard.BISHOP, 'r': bitboard.ROOK, 'q': bitboard.QUEEN, 'k': bitboard.KING}
+BITBOARD_SPECIAL_MOVES = {
+    bitboard.QUIET: False,
+    bitboard.CAPTURE: False,
+    bitboard.DOUBLE_PAWN_PUSH: 'pawn_double',
+    bitboard.EN_PASSANT: 'en_passant',
+    bitboard.PROMOTION: 'promotion',
+    bitboard.PROMOTION_CAPTURE: 'promotion'
+}
+BITBOARD_CAPTURES = {bitboard.CAPTURE, bitboard.EN_PASSANT, bitboard.PROMOTION_CAPTURE}
+
+class Undo:
+    __slots__ = ('piece', 'captured', 'can_castle', 'en_passant', 'last_move', 'halfmove_clock', 'castling', 'key')
+
+    def __init__(self, piece, captured, can_castle, en_passant, last_move, halfmove_clock, castling, key):
+        self.piece = piece
+        self.captured = captured
+        self.can_castle = can_castle
+        self.en_passant = en_passant
+        self.last_move = last_move
+        self.halfmove_clock = halfmove_clock
+        self.castling = castling
+        # Zobrist key of the position the move was made in
+        self.key = key
+
 class Move:
+    __slots__ = ('origin', 'target', 'special_move', 'move_info', 'is_capture')
+
     def __init__(self, origin, target, special_move = False, move_info = None, is_capture = False):
         self.origin = origin
         self.target = target
@@ -440,12 +2038,118 @@ class Move:
         self.move_info = move_info
         self.is_capture = is_capture
 
+    def __eq__(self, other):
+        return isinstance(other, Move) and self.origin == other.origin and self.target == other.target and self.special_move == other.special_move
+
+    def __hash__(self):
+        return hash((self.origin, self.target))
+
+def pack_entry(depth, bound, value, move, generation):
+    # Data word of a shared transposition table entry
+    packed_move = pack_move(move) if move is not None else 0
+    return value + SHARED_TT_VALUE_OFFSET | min(depth, 0xff) << 24 | bound << 32 | (generation & 0xff) << 34 | packed_move << 42
+
+def unpack_entry(data):
+    # Depth, bound, value, move and generation of a data word
+    packed_move = data >> 42
+    move = unpack_move(packed_move) if packed_move else None
+    return data >> 24 & 0xff, data >> 32 & 3, (data & 0xffffff) - SHARED_TT_VALUE_OFFSET, move, data >> 34 & 0xff
+
+def pack_move(move):
+    packed = square_index(move.origin) | square_index(move.target) << 6 | MOVE_FLAG_CODES[move.special_move] << 12 | move.is_capture << 15
+    # Only queen promotions exist
+    if move.special_move == 'promotion':
+        packed |= PROMOTION_PIECES.index('q') << 16
+
+    return packed
+
+def unpack_move(packed):
+    origin = divmod(packed & 63, 8)
+    target = divmod(packed >> 6 & 63, 8)
+    special_move = MOVE_FLAGS[packed >> 12 & 7]
+    move_info = None
+    if special_move == 'castling':
+        move_info = next(castling for castling in CASTLING['white' if origin[0] == 0 else 'black'] if castling['king_move'][1] == target)
+
+    return Move(origin, target, special_move, move_info, bool(packed >> 15 & 1))
+
+def packed_move_to_smith(packed):
+    return move_to_notation(divmod(packed & 63, 8)) + move_to_notation(divmod(packed >> 6 & 63, 8)) + PROMOTION_PIECES[packed >> 16 & 7]
+
+def smith_to_packed_move(board, notation):
+    # The legal move in Smith notation packed, or None
+    move = board.smith_to_move(notation)
+    return pack_move(move) if move is not None else None
+
+def mate_value(evaluation, ply):
+    # Value of a position without a king, plies from the root
+    return MATE_VALUE - ply if evaluation > 0 else ply - MATE_VALUE
+
+def value_to_table(value, ply):
+    # Mate values are stored relative to the position, as it can be reached
+    # at other plies
+    if value > MATE_THRESHOLD:
+        return value + ply
+    elif value < -MATE_THRESHOLD:
+        return value - ply
+
+    return value
+
+def value_from_table(value, ply):
+    if value > MATE_THRESHOLD:
+        return value - ply
+    elif value < -MATE_THRESHOLD:
+        return value + ply
+
+    return value
+
+def bound_type(value, α, β):
+    # Kind of result of a search in the window (α, β)
+    if value <= α:
+        return UPPER_BOUND
+    elif value >= β:
+        return LOWER_BOUND
+    else:
+        return EXACT
+
+def allocate_time(time_left, increment = 0, moves_to_go = None):
+    # Thinking time for one move given the remaining time on the clock, the
+    # increment per move and the number of moves until the next time control
+    moves_to_go = MOVES_TO_GO if moves_to_go is None else max(moves_to_go, 1)
+    time_limit = time_left / moves_to_go + increment * 0.75
+
+    return max(0, min(time_limit, time_left - TIME_SAFETY_MARGIN))
+
+def evaluate_pawn_structure(white_pawns, black_pawns):
+    # Passed, doubled and isolated pawn terms from white's point of view, for
+    # the (rank, file) positions of the pawns of both colors
+    score = 0
+    for pawns, opponent_pawns, sign in [(white_pawns, black_pawns, 1), (black_pawns, white_pawns, -1)]:
+        files = [0] * 10
+        for rank, file in pawns:
+            files[file + 1] += 1
+
+        for rank, file in pawns:
+            if files[file] == 0 and files[file + 2] == 0:
+                score -= sign * ISOLATED_PAWN_PENALTY
+            # Passed if no opponent pawn is in front of it on its own or the
+            # neighbouring files
+            if not any(abs(opponent_file - file) <= 1 and (opponent_rank - rank) * sign > 0 for opponent_rank, opponent_file in opponent_pawns):
+                score += sign * PASSED_PAWN_BONUS[rank if sign == 1 else 7 - rank]
+
+        score -= sign * DOUBLED_PAWN_PENALTY * sum(count - 1 for count in files if count > 1)
+
+    return score
+
 def opposite_color(color):
-    return 'white' if color == 'black' else 'black'
+    return OPPOSITE_COLORS[color]
 
 def add_pattern_to_position(position, pattern):
     return tuple(position[i] + pattern[i] for i in [0, 1])
 
+def square_index(position):
+    return position[0] * 8 + position[1]
+
 def is_on_board(position):
     return 0 <= position[0] <= 7 and 0 <= position[1] <= 7
 
@@ -458,47 +2162,19 @@ def notation_to_move(notation):
 def move_to_notation(move):
     return 'abcdefgh'[move[1]] + str(move[0] + 1)
 
+def move_to_smith(move):
+    notation = move_to_notation(move.origin) + move_to_notation(move.target)
+    return notation + 'q' if move.special_move == 'promotion' else notation
+
 def main():
-    board = Board()
-    
-    Pawn(board, (1,0), 'white')
-    Pawn(board, (1,1), 'white')
-    Pawn(board, (1,2), 'white')
-    Pawn(board, (1,3), 'white')
-    Pawn(board, (1,4), 'white')
-    Pawn(board, (1,5), 'white')
-    Pawn(board, (1,6), 'white')
-    Pawn(board, (1,7), 'white')
-    Rook(board, (0,0), 'white')
-    Knight(board, (0,1), 'white')
-    Bishop(board, (0,2), 'white')
-    Queen(board, (0,3), 'white')
-    King(board, (0,4), 'white')
-    Bishop(board, (0,5), 'white')
-    Knight(board, (0,6), 'white')
-    Rook(board, (0,7), 'white')
-    
-    Pawn(board, (6,0), 'black')
-    Pawn(board, (6,1), 'black')
-    Pawn(board, (6,2), 'black')
-    Pawn(board, (6,3), 'black')
-    Pawn(board, (6,4), 'black')
-    Pawn(board, (6,5), 'black')
-    Pawn(board, (6,6), 'black')
-    Pawn(board, (6,7), 'black')
-    Rook(board, (7,0), 'black')
-    Knight(board, (7,1), 'black')
-    Bishop(board, (7,2), 'black')
-    Queen(board, (7,3), 'black')
-    King(board, (7,4), 'black')
-    Bishop(board, (7,5), 'black')
-    Knight(board, (7,6), 'black')
-    Rook(board, (7,7), 'black')
+    board = Board.from_fen(START_FEN)
     
+    transposition_table = TranspositionTable()
+    book = polyglot.OpeningBook(BOOK_FILE, BOOK_SELECTION) if BOOK_FILE is not None else None
     board.show()
     while True:
         # Get legal moves
-        legal_moves = [move for move in board.get_moves_for_color(board.next_move_color)]
+        legal_moves = board.get_move_list_for_color(board.next_move_color)
         
         if len(legal_moves) == 0:
             if board.is_checked(board.next_move_color):
@@ -506,17 +2182,30 @@ def main():
             else:
                 print('draw!')
             break
+
+        if board.is_fifty_move_draw():
+            print('draw by the fifty-move rule!')
+            break
+
+        if board.is_repetition(2):
+            print('draw by threefold repetition!')
+            break
         
-        if board.next_move_color in EVALUATE_FOR:
+        book_move = book.find_move(board) if book is not None and board.next_move_color in EVALUATE_FOR else None
+        if book_move is not None:
+            print('Book move: ', move_to_notation(book_move.origin), ' to ', move_to_notation(book_move.target))
+        elif board.next_move_color in EVALUATE_FOR:
             start = time.time()
             
-            evaluation = board.evaluate(DEPTH)
+            evaluation = board.iterative_deepening(TIME_PER_MOVE, DEPTH, transposition_table = transposition_table)
             best_move = evaluation['move']
             best_score = evaluation['value']
 
             end = time.time()
             duration = round(end - start, 2)
-            print('Best move: ', move_to_notation(best_move.origin), ' to ', move_to_notation(best_move.target), ', Evaluation: ', best_score, ', In: ', str(duration), 's, Depth: ', DEPTH)
+            print('Best move: ', move_to_notation(best_move.origin), ' to ', move_to_notation(best_move.target), ', Evaluation: ', best_score, ', In: ', str(duration), 's, Depth: ', evaluation['depth'])
+            statistics = evaluation['statistics']
+            print('Nodes: ', statistics['nodes'], ', NPS: ', statistics['nps'], ', Quiescence nodes: ', statistics['quiescence_nodes'], ', First move cutoffs: ', statistics['first_move_cutoff_rate'], ', TT hit rate: ', statistics['tt_hit_rate'])
 
         
         is_legal = False
@@ -525,10 +2214,13 @@ def main():
             origin = notation_to_move(move[:2])
             target = notation_to_move(move[2:])
             
+            # The moves are made on the same board, so that its history is
+            # kept for the repetition draws
             for move in legal_moves:
-                if move.last_move.origin == origin and move.last_move.target == target:
+                if move.origin == origin and move.target == target:
                     is_legal = True
-                    board = move
+                    board.make_move(move)
+                    break
 
         board.show()
 
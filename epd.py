@@ -0,0 +1,105 @@
+import argparse
+import json
+import shlex
+import time
+
+from chessy3 import Board, TranspositionTable, DEPTH
+
+def parse_epd(line):
+    # An EPD record is the first four FEN fields followed by operations like
+    # 'bm Nf3; id "test 1";'
+    fields = line.split(None, 4)
+    board = Board.from_fen(' '.join(fields[:4]))
+
+    operations = {}
+    if len(fields) > 4:
+        for operation in fields[4].split(';'):
+            operands = shlex.split(operation)
+            if operands:
+                operations[operands[0]] = operands[1:]
+
+    return board, operations
+
+def read_epd(lines):
+    # Stream the records of an EPD file, skipping blank lines and comments
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith('#'):
+            yield parse_epd(line)
+
+def solve_position(board, operations, time_limit = None, max_depth = DEPTH, transposition_table = None):
+    start = time.perf_counter()
+    evaluation = board.iterative_deepening(time_limit, max_depth, transposition_table = transposition_table)
+    duration = time.perf_counter() - start
+
+    move = board.move_to_san(evaluation['move']).rstrip('+#') if evaluation['move'] is not None else None
+    best_moves = [san.rstrip('+#!?') for san in operations.get('bm', [])]
+    avoid_moves = [san.rstrip('+#!?') for san in operations.get('am', [])]
+    if best_moves:
+        solved = move in best_moves
+    elif avoid_moves:
+        solved = move not in avoid_moves
+    else:
+        solved = None
+
+    return {
+        'id': ' '.join(operations.get('id', [])),
+        'fen': board.to_fen(),
+        'move': move,
+        'bm': best_moves,
+        'am': avoid_moves,
+        'solved': solved,
+        'value': evaluation['value'],
+        'depth': evaluation['depth'],
+        'nodes': evaluation['nodes'],
+        'time': round(duration, 4)
+    }
+
+def run_suite(lines, time_limit = None, max_depth = DEPTH, hash_size_mb = None, callback = None):
+    # Search every position of the suite within the time and depth budget and
+    # count how many are solved
+    results = []
+    for board, operations in read_epd(lines):
+        result = solve_position(board, operations, time_limit, max_depth, TranspositionTable(hash_size_mb))
+        results.append(result)
+        if callback is not None:
+            callback(result)
+
+    scored = [result for result in results if result['solved'] is not None]
+    solved = sum(1 for result in scored if result['solved'])
+    nodes = sum(result['nodes'] for result in results)
+    duration = sum(result['time'] for result in results)
+
+    return {
+        'positions': len(results),
+        'solved': solved,
+        'solve_rate': solved / len(scored) if scored else 0,
+        'nodes': nodes,
+        'time': round(duration, 4),
+        'nps': round(nodes / duration) if duration > 0 else 0,
+        'results': results
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Run an EPD test suite')
+    parser.add_argument('suite', help = 'EPD file with bm or am operations')
+    parser.add_argument('--time', type = float, help = 'seconds per position')
+    parser.add_argument('--depth', type = int, default = DEPTH, help = 'maximum depth per position')
+    parser.add_argument('--hash', type = int, help = 'transposition table size in MB')
+    parser.add_argument('--output', help = 'write the JSON results to this file')
+    args = parser.parse_args()
+
+    def report(result):
+        status = 'solved' if result['solved'] else 'failed' if result['solved'] is not None else 'played'
+        print(result['id'] or result['fen'], status, result['move'], 'depth', result['depth'], 'nodes', result['nodes'], 'time', result['time'])
+
+    with open(args.suite) as suite:
+        summary = run_suite(suite, args.time, args.depth, args.hash, report)
+
+    print('Solved', summary['solved'], 'of', summary['positions'], 'nodes', summary['nodes'], 'time', summary['time'], 'nps', summary['nps'])
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(summary, output_file, indent = 2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,336 @@
+import argparse
+import contextlib
+import json
+import math
+import multiprocessing
+import time
+
+import chessy3
+
+from chessy3 import Board, Search, TranspositionTable, PawnTable, Pawn, Queen, Rook, DEPTH, START_FEN, move_to_smith
+from epd import read_epd
+
+# Game adjudication: a game is drawn after MAX_MOVES moves, or once both
+# engines scored the position within DRAW_SCORE of 0 for DRAW_MOVES moves each
+# after move DRAW_MOVE_NUMBER. It is won once both engines agreed for
+# RESIGN_MOVES moves each that one side is at least RESIGN_SCORE ahead, which
+# includes every mate found by the search.
+MAX_MOVES = 200
+DRAW_MOVE_NUMBER = 40
+DRAW_MOVES = 8
+DRAW_SCORE = 10
+RESIGN_MOVES = 3
+RESIGN_SCORE = 1000
+
+# Sequential probability ratio test: the Elo difference of the hypotheses and
+# the probabilities of accepting H1 when H0 holds (alpha) and H0 when H1 holds
+# (beta)
+SPRT_ELO0 = 0
+SPRT_ELO1 = 10
+SPRT_ALPHA = 0.05
+SPRT_BETA = 0.05
+
+RESULT_SCORES = {'1-0': 1, '0-1': 0, '1/2-1/2': 0.5}
+
+def parse_engine(description, name):
+    # Engine configuration from a description like 'depth=3 time=0.5
+    # null_move_pruning=false PAWN_STRUCTURE=false'. Lowercase options are
+    # attributes of Search, uppercase options settings of chessy3. Values
+    # are read as JSON, falling back to strings.
+    engine = {'name': name, 'depth': DEPTH, 'time': None, 'options': {}}
+    for option in description.split():
+        key, value = option.split('=', 1)
+        try:
+            value = json.loads(value)
+        except ValueError:
+            pass
+
+        if key in ['name', 'depth', 'time']:
+            engine[key] = value
+        elif key.isupper() and not hasattr(chessy3, key) or key.islower() and not hasattr(Search(Board()), key):
+            raise ValueError('Unknown engine option ' + key)
+        else:
+            engine['options'][key] = value
+
+    return engine
+
+def read_openings(lines):
+    # FEN of every record of a FEN or EPD file
+    return [board.to_fen() for board, operations in read_epd(lines)]
+
+def is_insufficient_material(board):
+    # No pawns, rooks or queens and at most one minor piece left
+    pieces = [piece for piece in board.pieces if piece.char != 'k']
+    return len(pieces) <= 1 and not any(isinstance(piece, (Pawn, Rook, Queen)) for piece in pieces)
+
+class Player:
+    # An engine playing one game, with its own tables
+    def __init__(self, engine):
+        self.engine = engine
+        with self.settings():
+            self.transposition_table = TranspositionTable()
+            self.pawn_table = PawnTable()
+
+    @contextlib.contextmanager
+    def settings(self):
+        # The settings of the engine are only changed while it builds its
+        # tables and searches, as both engines play in the same process
+        settings = {key: value for key, value in self.engine['options'].items() if key.isupper()}
+        previous = {key: getattr(chessy3, key) for key in settings}
+        for key, value in settings.items():
+            setattr(chessy3, key, value)
+        try:
+            yield
+        finally:
+            for key, value in previous.items():
+                setattr(chessy3, key, value)
+
+    def search(self, board):
+        with self.settings():
+            # The board of the game was built with the default settings
+            board.move_generator = chessy3.MOVE_GENERATOR
+            board.legality_check = chessy3.LEGALITY_CHECK
+            board.pawn_table = self.pawn_table
+            search = Search(board, self.transposition_table)
+            for key, value in self.engine['options'].items():
+                if key.islower():
+                    setattr(search, key, value)
+
+            return search.iterative_deepening(self.engine['time'], self.engine['depth'])
+
+def play_game(fen, white, black):
+    # Play one game from the position, returns the result, the reason the
+    # game ended and the moves in standard algebraic notation
+    board = Board.from_fen(fen)
+    players = {'white': Player(white), 'black': Player(black)}
+    draw_moves = 0
+    winning_moves = {'white': 0, 'black': 0}
+    losing_moves = {'white': 0, 'black': 0}
+    moves = []
+
+    while True:
+        color = board.next_move_color
+        legal_moves = board.get_move_list_for_color(color)
+        if not legal_moves:
+            if board.is_checked(color):
+                return ('0-1' if color == 'white' else '1-0'), 'checkmate', moves
+            return '1/2-1/2', 'stalemate', moves
+        if board.is_fifty_move_draw():
+            return '1/2-1/2', 'fifty-move rule', moves
+        if board.is_repetition(2):
+            return '1/2-1/2', 'threefold repetition', moves
+        if is_insufficient_material(board):
+            return '1/2-1/2', 'insufficient material', moves
+        if len(moves) >= 2 * MAX_MOVES:
+            return '1/2-1/2', 'move limit', moves
+
+        result = players[color].search(board)
+        # Matched against the legal moves, as the match must never play an
+        # illegal move
+        notation = move_to_smith(result['move']) if result['move'] is not None else None
+        move = next((move for move in legal_moves if move_to_smith(move) == notation), legal_moves[0])
+        moves.append(board.move_to_san(move))
+        board.make_move(move)
+
+        value = result['value']
+        draw_moves = draw_moves + 1 if board.fullmove_number > DRAW_MOVE_NUMBER and abs(value) <= DRAW_SCORE else 0
+        if draw_moves >= 2 * DRAW_MOVES:
+            return '1/2-1/2', 'adjudication', moves
+
+        winning_moves[color] = winning_moves[color] + 1 if value >= RESIGN_SCORE else 0
+        losing_moves[color] = losing_moves[color] + 1 if value <= -RESIGN_SCORE else 0
+        opponent = chessy3.opposite_color(color)
+        if winning_moves[color] >= RESIGN_MOVES and losing_moves[opponent] >= RESIGN_MOVES:
+            return ('1-0' if color == 'white' else '0-1'), 'adjudication', moves
+        if losing_moves[color] >= RESIGN_MOVES and winning_moves[opponent] >= RESIGN_MOVES:
+            return ('0-1' if color == 'white' else '1-0'), 'adjudication', moves
+
+def game_to_pgn(game):
+    # PGN of a played game, with the starting position if it is not the
+    # standard one
+    board = Board.from_fen(game['fen'])
+    headers = [
+        ('Event', game['event']),
+        ('Site', '?'),
+        ('Date', game['date']),
+        ('Round', str(game['round'])),
+        ('White', game['white']),
+        ('Black', game['black']),
+        ('Result', game['result'])
+    ]
+    if game['fen'] != START_FEN:
+        headers += [('SetUp', '1'), ('FEN', game['fen'])]
+    headers.append(('Termination', game['termination']))
+
+    tokens = []
+    move_number = board.fullmove_number
+    for index, san in enumerate(game['moves']):
+        white_to_move = (index % 2 == 0) == (board.next_move_color == 'white')
+        if white_to_move:
+            tokens.append(str(move_number) + '.')
+        elif index == 0:
+            tokens.append(str(move_number) + '...')
+        if not white_to_move:
+            move_number += 1
+        tokens.append(san)
+    tokens.append(game['result'])
+
+    # Movetext lines of at most 80 characters
+    lines = ['']
+    for token in tokens:
+        if lines[-1] and len(lines[-1]) + 1 + len(token) > 80:
+            lines.append('')
+        lines[-1] = lines[-1] + ' ' + token if lines[-1] else token
+
+    return ''.join('[%s "%s"]\n' % header for header in headers) + '\n' + '\n'.join(lines) + '\n\n'
+
+def score_to_elo(score):
+    return -400 * math.log10(1 / score - 1)
+
+def elo_to_score(elo):
+    return 1 / (1 + 10 ** (-elo / 400))
+
+def score_variance(wins, draws, losses):
+    # Variance of the score of one game
+    games = wins + draws + losses
+    score = (wins + draws / 2) / games
+    return (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+
+def elo_difference(wins, draws, losses):
+    # Elo difference from the score, with the 95% confidence margin. None
+    # while there are no games or only wins or only losses.
+    games = wins + draws + losses
+    if games == 0 or wins + draws / 2 in [0, games]:
+        return None, None
+
+    score = (wins + draws / 2) / games
+    margin = 1.96 * math.sqrt(score_variance(wins, draws, losses) / games)
+    if score - margin <= 0 or score + margin >= 1:
+        return score_to_elo(score), None
+
+    return score_to_elo(score), (score_to_elo(score + margin) - score_to_elo(score - margin)) / 2
+
+def sprt(wins, draws, losses, elo0 = SPRT_ELO0, elo1 = SPRT_ELO1, alpha = SPRT_ALPHA, beta = SPRT_BETA):
+    # Log likelihood ratio of H1 (elo1) against H0 (elo0) from the normal
+    # approximation of the score, and the test result: 'H1' or 'H0' once the
+    # ratio crosses a bound, None while the test goes on
+    lower = math.log(beta / (1 - alpha))
+    upper = math.log((1 - beta) / alpha)
+    games = wins + draws + losses
+    llr = 0
+    if games > 0:
+        score = (wins + draws / 2) / games
+        variance = score_variance(wins, draws, losses)
+        if variance > 0:
+            score0 = elo_to_score(elo0)
+            score1 = elo_to_score(elo1)
+            llr = games * (score1 - score0) * (2 * score - score0 - score1) / (2 * variance)
+
+    result = 'H1' if llr >= upper else 'H0' if llr <= lower else None
+    return {'llr': round(llr, 4), 'lower': round(lower, 4), 'upper': round(upper, 4), 'result': result}
+
+def play_match_game(task):
+    # Game of a match in a worker process
+    number, fen, white, black = task
+    result, termination, moves = play_game(fen, white, black)
+    return {
+        'round': number + 1,
+        'fen': fen,
+        'white': white['name'],
+        'black': black['name'],
+        'result': result,
+        'termination': termination,
+        'moves': moves
+    }
+
+def run_match(first, second, openings = None, games = None, processes = None, pgn_path = None, use_sprt = False, callback = None):
+    # Play games between two engines in a pool of processes, every opening
+    # twice with the colors swapped. Results are from the first engine's point
+    # of view. With use_sprt the match stops as soon as the SPRT accepts a
+    # hypothesis.
+    openings = openings or [START_FEN]
+    games = 2 * len(openings) if games is None else games
+    tasks = []
+    for number in range(games):
+        fen = openings[number // 2 % len(openings)]
+        tasks.append((number, fen, first, second) if number % 2 == 0 else (number, fen, second, first))
+
+    event = '%s vs %s' % (first['name'], second['name'])
+    date = time.strftime('%Y.%m.%d')
+    start = time.time()
+    results = []
+    wins = draws = losses = 0
+    test = sprt(0, 0, 0)
+
+    pgn_file = open(pgn_path, 'w') if pgn_path is not None else None
+    pool = multiprocessing.Pool(processes)
+    try:
+        for game in pool.imap_unordered(play_match_game, tasks):
+            game.update(event = event, date = date)
+            results.append(game)
+            if pgn_file is not None:
+                pgn_file.write(game_to_pgn(game))
+                pgn_file.flush()
+
+            # The first engine plays white in the odd rounds
+            score = RESULT_SCORES[game['result']]
+            if game['round'] % 2 == 0:
+                score = 1 - score
+            wins += score == 1
+            draws += score == 0.5
+            losses += score == 0
+            test = sprt(wins, draws, losses)
+            if callback is not None:
+                callback(game, wins, draws, losses, test)
+            if use_sprt and test['result'] is not None:
+                break
+    finally:
+        pool.terminate()
+        pool.join()
+        if pgn_file is not None:
+            pgn_file.close()
+
+    elo, margin = elo_difference(wins, draws, losses)
+    return {
+        'games': len(results),
+        'wins': wins,
+        'draws': draws,
+        'losses': losses,
+        'score': round((wins + draws / 2) / len(results), 4) if results else None,
+        'elo': round(elo, 1) if elo is not None else None,
+        'elo_margin': round(margin, 1) if margin is not None else None,
+        'sprt': test,
+        'time': round(time.time() - start, 2),
+        'results': sorted(results, key = lambda game: game['round'])
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Play a match between two engine configurations')
+    parser.add_argument('first', help = "options of the first engine, e.g. 'name=new depth=3'")
+    parser.add_argument('second', help = "options of the second engine, e.g. 'name=old depth=3 null_move_pruning=false'")
+    parser.add_argument('--openings', help = 'FEN or EPD file of starting positions, each played with both colors')
+    parser.add_argument('--games', type = int, help = 'number of games, by default two per opening')
+    parser.add_argument('--processes', type = int, help = 'games played at once, by default one per CPU')
+    parser.add_argument('--pgn', help = 'write the games to this PGN file')
+    parser.add_argument('--sprt', action = 'store_true', help = 'stop once the SPRT of SPRT_ELO0 against SPRT_ELO1 is decided')
+    parser.add_argument('--output', help = 'write the JSON results to this file')
+    args = parser.parse_args()
+
+    first = parse_engine(args.first, 'first')
+    second = parse_engine(args.second, 'second')
+    openings = None
+    if args.openings:
+        with open(args.openings) as openings_file:
+            openings = read_openings(openings_file)
+
+    def report(game, wins, draws, losses, test):
+        print('Game', game['round'], game['white'], 'vs', game['black'], game['result'], game['termination'], 'Score', '%d-%d-%d' % (wins, losses, draws), 'LLR', test['llr'])
+
+    summary = run_match(first, second, openings, args.games, args.processes, args.pgn, args.sprt, report)
+    print('Elo', summary['elo'], '+/-', summary['elo_margin'], 'SPRT', summary['sprt']['result'] or 'undecided', 'LLR', summary['sprt']['llr'], '(%s, %s)' % (summary['sprt']['lower'], summary['sprt']['upper']))
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(summary, output_file, indent = 2)
+
+if __name__ == '__main__':
+    main()
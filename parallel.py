@@ -0,0 +1,220 @@
+import argparse
+import json
+import multiprocessing
+import time
+
+from chessy3 import Board, Search, SearchTimeout, TranspositionTable, SharedTranspositionTable, INFINITY, MATE_THRESHOLD, MAX_DEPTH, ITERATION_TIME_FRACTION, move_to_smith
+
+# Positions for measuring the speedup of the parallel search
+BENCHMARK_POSITIONS = [
+    'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1',
+    'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+    'r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10',
+    '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1'
+]
+
+# State of a worker process, set up by init_worker
+worker_alpha = None
+worker_stop = None
+worker_table = None
+
+def init_worker(alpha, stop_event, hash_size_mb, shared_table = None):
+    global worker_alpha, worker_stop, worker_table
+    worker_alpha = alpha
+    worker_stop = stop_event
+    worker_table = TranspositionTable(hash_size_mb) if shared_table is None else shared_table
+
+def game_moves(board):
+    # FEN of the position after the last capture or pawn move and the moves
+    # played since, so that a worker can replay them and see the repetitions
+    moves = []
+    count = min(board.halfmove_clock, len(board.history))
+    while len(moves) < count and board.last_move is not None:
+        moves.append(board.last_move)
+        board.unmake_move()
+    fen = board.to_fen()
+    for move in reversed(moves):
+        board.make_move(move)
+
+    return fen, [move_to_smith(move) for move in reversed(moves)]
+
+def search_root_move(fen, notation, depth, β, deadline, generation = 0, moves = ()):
+    # Search one root move in a worker, with the best score found by any
+    # worker so far as α. The position is the FEN after the game moves in
+    # Smith notation. Returns None as value if the search was stopped, and the
+    # principal variation after the move.
+    board = Board.from_fen(fen)
+    for game_move in moves:
+        board.make_move(board.smith_to_move(game_move))
+    move = board.smith_to_move(notation) or next(move for move in board.get_move_list_for_color(board.next_move_color, False) if move_to_smith(move) == notation)
+    search = Search(board, worker_table)
+    # All moves of one root search share the generation of the table entries
+    worker_table.generation = generation
+    search.deadline = deadline
+    search.stop_event = worker_stop
+
+    board.make_move(move)
+    try:
+        value = -search.negamax(depth - 1, -β, -worker_alpha.value, 1)
+    except SearchTimeout:
+        return notation, None, search.nodes, []
+
+    with worker_alpha.get_lock():
+        if value > worker_alpha.value:
+            worker_alpha.value = value
+
+    return notation, value, search.nodes, [move_to_smith(move) for move in search.principal_variation[1]]
+
+class ParallelSearch:
+    # Root splitting over a pool of processes: the first root move is searched
+    # alone to get a good α, then the remaining moves are shared out to the
+    # workers, which all narrow their window with the shared α. With
+    # shared_table the workers use one transposition table in shared memory,
+    # otherwise each worker has its own.
+    def __init__(self, processes = None, hash_size_mb = None, shared_table = True):
+        self.processes = processes or multiprocessing.cpu_count()
+        self.alpha = multiprocessing.Value('i', -INFINITY)
+        self.worker_stop = multiprocessing.Event()
+        self.table = SharedTranspositionTable(hash_size_mb) if shared_table else None
+        self.pool = multiprocessing.Pool(self.processes, init_worker, (self.alpha, self.worker_stop, hash_size_mb, self.table))
+        self.generation = 0
+        self.nodes = 0
+
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
+        if self.table is not None:
+            self.table.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+    def wait(self, result, stop_event):
+        # Wait for a pool result, passing a stop request on to the workers
+        while True:
+            try:
+                return result.get(0.05)
+            except multiprocessing.TimeoutError:
+                if stop_event is not None and stop_event.is_set():
+                    self.worker_stop.set()
+
+    def search_root(self, board, depth, deadline = None, stop_event = None, first_move = None):
+        fen, played = game_moves(board)
+        moves = board.get_move_list_for_color(board.next_move_color)
+        if not moves:
+            return { 'value': board.evaluate_without_moves(), 'move': None, 'pv': [] }
+
+        Search(board).order_moves(moves, first_move, 0)
+        notations = [move_to_smith(move) for move in moves]
+        self.alpha.value = -INFINITY
+        self.worker_stop.clear()
+        self.generation += 1
+
+        first = self.wait(self.pool.apply_async(search_root_move, (fen, notations[0], depth, INFINITY, deadline, self.generation, played)), stop_event)
+        results = [first]
+        if first[1] is not None:
+            pending = [self.pool.apply_async(search_root_move, (fen, notation, depth, INFINITY, deadline, self.generation, played)) for notation in notations[1:]]
+            results += [self.wait(result, stop_event) for result in pending]
+
+        self.nodes += sum(result[2] for result in results)
+        if any(result[1] is None for result in results):
+            raise SearchTimeout()
+
+        # Moves that failed low only have an upper bound, the first move with
+        # the highest value is the best one
+        best_index = max(range(len(results)), key = lambda index: (results[index][1], -index))
+        return { 'value': results[best_index][1], 'move': moves[best_index], 'pv': self.principal_variation(board, moves[best_index], results[best_index][3]) }
+
+    def principal_variation(self, board, move, notations):
+        # Moves of the principal variation a worker found after the move, as
+        # far as they are legal
+        pv = [move]
+        board.make_move(move)
+        for notation in notations:
+            move = board.smith_to_move(notation)
+            if move is None:
+                break
+            pv.append(move)
+            board.make_move(move)
+
+        for move in pv:
+            board.unmake_move()
+
+        return pv
+
+    def iterative_deepening(self, board, time_limit = None, max_depth = MAX_DEPTH, callback = None, stop_event = None):
+        start = time.time()
+        self.nodes = 0
+        result = None
+        best_move = None
+
+        for depth in range(1, max_depth + 1):
+            deadline = start + time_limit if time_limit is not None and result is not None else None
+            if stop_event is not None and stop_event.is_set():
+                break
+
+            try:
+                evaluation = self.search_root(board, depth, deadline, stop_event, best_move)
+            except SearchTimeout:
+                break
+
+            best_move = evaluation['move']
+            result = { 'value': evaluation['value'], 'move': evaluation['move'], 'pv': evaluation['pv'], 'depth': depth, 'nodes': self.nodes, 'time': time.time() - start }
+            if callback is not None:
+                callback(result)
+
+            if evaluation['move'] is None or abs(evaluation['value']) > MATE_THRESHOLD:
+                break
+            if time_limit is not None and time.time() - start > time_limit * ITERATION_TIME_FRACTION:
+                break
+
+        return result
+
+def benchmark(positions = BENCHMARK_POSITIONS, depth = 4, processes = None):
+    # Time a fixed depth search of every position with one process and with
+    # the process pool, and report the speedup
+    results = []
+    with ParallelSearch(processes) as parallel:
+        for fen in positions:
+            board = Board.from_fen(fen)
+            search = Search(board)
+            start = time.perf_counter()
+            single = search.search_root(depth)
+            single_time = time.perf_counter() - start
+
+            parallel.nodes = 0
+            start = time.perf_counter()
+            multi = parallel.search_root(board, depth)
+            parallel_time = time.perf_counter() - start
+
+            results.append({
+                'fen': fen,
+                'depth': depth,
+                'single': { 'move': move_to_smith(single['move']), 'value': single['value'], 'nodes': search.nodes, 'time': round(single_time, 4) },
+                'parallel': { 'move': move_to_smith(multi['move']), 'value': multi['value'], 'nodes': parallel.nodes, 'time': round(parallel_time, 4) },
+                'speedup': round(single_time / parallel_time, 3)
+            })
+
+        processes = parallel.processes
+
+    single_time = sum(result['single']['time'] for result in results)
+    parallel_time = sum(result['parallel']['time'] for result in results)
+    return {
+        'processes': processes,
+        'positions': results,
+        'speedup': round(single_time / parallel_time, 3) if parallel_time > 0 else 0
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Measure the speedup of the parallel root search')
+    parser.add_argument('--depth', type = int, default = 4)
+    parser.add_argument('--processes', type = int)
+    args = parser.parse_args()
+
+    print(json.dumps(benchmark(depth = args.depth, processes = args.processes), indent = 2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+import argparse
+import json
+import sys
+import time
+
+from chessy3 import Board, move_to_smith
+
+# Reference positions with their known node counts per depth. Only depths
+# without underpromotions are listed, as the engine always promotes to a
+# queen.
+REFERENCE_POSITIONS = [
+    {
+        'name': 'start position',
+        'fen': 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1',
+        'nodes': [20, 400, 8902, 197281]
+    },
+    {
+        'name': 'kiwipete',
+        'fen': 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+        'nodes': [48, 2039, 97862]
+    },
+    {
+        'name': 'rook and pawns endgame',
+        'fen': '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1',
+        'nodes': [14, 191, 2812, 43238, 674624]
+    },
+    {
+        'name': 'promotions and checks',
+        'fen': 'r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1',
+        'nodes': [6]
+    },
+    {
+        'name': 'middlegame',
+        'fen': 'r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10',
+        'nodes': [46, 2079, 89890]
+    },
+    {
+        'name': 'illegal en passant exposing the king on the rank',
+        'fen': '3k4/3p4/8/K1P4r/8/8/8/8 b - - 0 1',
+        'nodes': [18, 92, 1670, 10138]
+    },
+    {
+        'name': 'illegal en passant exposing the king on the diagonal',
+        'fen': '8/8/4k3/8/2p5/8/B2P2K1/8 w - - 0 1',
+        'nodes': [13, 102, 1266, 10276]
+    },
+    {
+        'name': 'en passant capture gives check',
+        'fen': '8/8/1k6/2b5/2pP4/8/5K2/8 b - d3 0 1',
+        'nodes': [15, 126, 1928, 13931]
+    },
+    {
+        'name': 'short castling gives check',
+        'fen': '5k2/8/8/8/8/8/8/4K2R w K - 0 1',
+        'nodes': [15, 66, 1198, 6399]
+    },
+    {
+        'name': 'long castling gives check',
+        'fen': '3k4/8/8/8/8/8/8/R3K3 w Q - 0 1',
+        'nodes': [16, 71, 1286, 7418]
+    },
+    {
+        'name': 'castling rights lost by captures',
+        'fen': 'r3k2r/1b4bq/8/8/8/8/7B/R3K2R w KQkq - 0 1',
+        'nodes': [26, 1141, 27826]
+    },
+    {
+        'name': 'castling prevented by attacked squares',
+        'fen': 'r3k2r/8/3Q4/8/8/5q2/8/R3K2R b KQkq - 0 1',
+        'nodes': [44, 1494, 50509]
+    },
+    {
+        'name': 'both sides can castle',
+        'fen': 'r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1',
+        'nodes': [26, 568, 13744]
+    },
+    {
+        'name': 'discovered check',
+        'fen': '5K2/8/1Q6/2N5/8/1p2k3/8/8 w - - 0 1',
+        'nodes': [29, 165, 5160]
+    },
+    {
+        'name': 'double check',
+        'fen': '8/8/2k5/5q2/5n2/8/5K2/8 b - - 0 1',
+        'nodes': [37, 183, 6559, 23527]
+    },
+    {
+        'name': 'self stalemate',
+        'fen': 'K1k5/8/P7/8/8/8/8/8 w - - 0 1',
+        'nodes': [2, 6, 13, 63]
+    }
+]
+
+def perft(board, depth):
+    # Number of legal move sequences of the given length
+    moves = board.get_move_list_for_color(board.next_move_color)
+    if depth == 1:
+        return len(moves)
+
+    nodes = 0
+    for move in moves:
+        board.make_move(move)
+        nodes += perft(board, depth - 1)
+        board.unmake_move()
+
+    return nodes
+
+def divide(board, depth):
+    # Perft split up by the first move, to find where two generators differ
+    result = {}
+    for move in board.get_move_list_for_color(board.next_move_color):
+        board.make_move(move)
+        result[move_to_smith(move)] = perft(board, depth - 1) if depth > 1 else 1
+        board.unmake_move()
+
+    return result
+
+def run_benchmark(max_depth = 3, positions = REFERENCE_POSITIONS, move_generator = None, legality_check = None):
+    # Perft of every reference position up to max_depth (or the deepest known
+    # count), with timings and whether the node counts are correct
+    results = []
+    total_nodes = 0
+    total_time = 0
+    for position in positions:
+        depth = min(max_depth, len(position['nodes']))
+        board = Board.from_fen(position['fen'])
+        if move_generator is not None:
+            board.move_generator = move_generator
+        if legality_check is not None:
+            board.legality_check = legality_check
+
+        start = time.perf_counter()
+        nodes = perft(board, depth)
+        duration = time.perf_counter() - start
+
+        total_nodes += nodes
+        total_time += duration
+        results.append({
+            'name': position['name'],
+            'fen': position['fen'],
+            'depth': depth,
+            'nodes': nodes,
+            'expected': position['nodes'][depth - 1],
+            'passed': nodes == position['nodes'][depth - 1],
+            'time': round(duration, 4),
+            'nps': round(nodes / duration) if duration > 0 else 0
+        })
+
+    return {
+        'positions': results,
+        'passed': all(result['passed'] for result in results),
+        'nodes': total_nodes,
+        'time': round(total_time, 4),
+        'nps': round(total_nodes / total_time) if total_time > 0 else 0
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Perft benchmark of the move generator')
+    parser.add_argument('--depth', type = int, default = 3, help = 'maximum perft depth per position')
+    parser.add_argument('--fen', help = 'divide a single position instead of running the suite')
+    parser.add_argument('--generator', choices = ['mailbox', 'bitboard'], help = 'move generator to test')
+    parser.add_argument('--legality', choices = ['pins', 'make'], help = 'legality check of the generated moves')
+    parser.add_argument('--output', help = 'write the JSON results to this file')
+    args = parser.parse_args()
+
+    if args.fen:
+        board = Board.from_fen(args.fen)
+        if args.generator is not None:
+            board.move_generator = args.generator
+        if args.legality is not None:
+            board.legality_check = args.legality
+        result = divide(board, args.depth)
+        result = { 'moves': result, 'nodes': sum(result.values()) }
+    else:
+        result = run_benchmark(args.depth, move_generator = args.generator, legality_check = args.legality)
+
+    output = json.dumps(result, indent = 2)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(output)
+    else:
+        print(output)
+
+    if not result.get('passed', True):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
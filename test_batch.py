@@ -0,0 +1,30 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from batch import encode_boards, evaluate_boards, compare
+from chessy3 import Board, King, Queen
+from perft import REFERENCE_POSITIONS
+
+def test_batch_evaluation_matches_scalar():
+    boards = [Board.from_fen(position['fen']) for position in REFERENCE_POSITIONS]
+    board = Board()
+    King(board, (0, 4), 'white')
+    King(board, (7, 4), 'black')
+    Queen(board, (3, 3), 'black')
+    board.next_move_color = 'black'
+    boards.append(board)
+    
+    values = evaluate_boards(boards)
+    
+    assert values.tolist() == [board.evaluate()['value'] for board in boards]
+    assert compare(boards)['identical']
+
+def test_encode_boards():
+    planes, side_to_move = encode_boards([Board.from_fen('4k3/8/8/8/8/8/8/4K2R b K - 0 1')])
+    
+    assert planes.shape == (1, 12, 64)
+    assert planes.sum() == 3
+    assert planes[0, 0, 4] == planes[0, 6, 60] == planes[0, 2, 7] == 1
+    assert side_to_move.tolist() == [-1]
+    assert evaluate_boards([]).shape == (0,)
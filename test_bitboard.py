@@ -0,0 +1,36 @@
+import bitboard
+from chessy3 import Board
+from perft import REFERENCE_POSITIONS, perft, run_benchmark
+
+def test_attack_tables():
+    assert bin(bitboard.KNIGHT_ATTACKS[0]).count('1') == 2
+    assert bin(bitboard.KING_ATTACKS[27]).count('1') == 8
+    assert bitboard.PAWN_ATTACKS[bitboard.WHITE][8] == 1 << 17
+    assert bitboard.rook_attacks(0, 0) == (bitboard.FILE_A | bitboard.RANK_1) ^ 1
+    assert bitboard.rook_attacks(0, 1 << 16 | 1 << 3) == 1 << 8 | 1 << 16 | 1 << 1 | 1 << 2 | 1 << 3
+    assert bitboard.bishop_attacks(27, 1 << 45) == bitboard.bishop_attacks(27, 0) & ~(1 << 54 | 1 << 63)
+
+def test_generators_agree():
+    for position in REFERENCE_POSITIONS:
+        board = Board.from_fen(position['fen'])
+        mailbox_moves = board.get_move_list_for_color(board.next_move_color)
+        board.move_generator = 'bitboard'
+        bitboard_moves = board.get_move_list_for_color(board.next_move_color)
+        
+        assert sorted((move.origin, move.target, move.special_move, move.is_capture) for move in mailbox_moves) == sorted((move.origin, move.target, move.special_move, move.is_capture) for move in bitboard_moves)
+
+def test_bitboard_perft():
+    assert run_benchmark(max_depth = 2, move_generator = 'bitboard')['passed']
+    
+    board = Board.from_fen(REFERENCE_POSITIONS[1]['fen'])
+    board.move_generator = 'bitboard'
+    
+    assert perft(board, 3) == 97862
+
+def test_is_attacked_agrees():
+    board = Board.from_fen('r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1')
+    pieces = board.get_bitboards()
+    
+    for square in range(64):
+        for color in ['white', 'black']:
+            assert bitboard.is_attacked(pieces, square, 0 if color == 'white' else 1) == board.is_attacked((square // 8, square % 8), color)
@@ -1,4 +1,8 @@
-from chessy3 import Board, Move, King, Queen, Rook, Bishop, Knight, Pawn
+import time
+
+import chessy3
+
+from chessy3 import Board, Move, King, Queen, Rook, Bishop, Knight, Pawn, TranspositionTable, EXACT, LOWER_BOUND, Search, allocate_time
 
 def test_king_on_board():
     board = Board()
@@ -274,6 +278,681 @@ def test_mate_detection():
     assert board.evaluate(depth=2)['value'] < 10000
 
     
+
+def test_square_lookup_follows_moves():
+    board = Board()
+    King(board, (0, 4), 'white')
+    rook = Rook(board, (0, 0), 'white')
+    King(board, (7, 4), 'black')
+    
+    rook.move_piece((5, 0))
+    
+    assert board.get_piece_by_position((0, 0)) is None
+    assert board.get_piece_by_position((5, 0)) is rook
+    assert board.get_piece_by_position((8, 0)) is None
+    
+    board.remove_piece_by_position((5, 0))
+    
+    assert board.get_piece_by_position((5, 0)) is None
+    assert len(board.pieces) == 2
+    assert board.get_king_by_color('black').position == (7, 4)
+
+def test_promotion_with_capture():
+    board = Board()
+    King(board, (0, 0), 'white')
+    Pawn(board, (6, 0), 'white')
+    Rook(board, (7, 1), 'black')
+    King(board, (7, 7), 'black')
+    
+    move = Move((6, 0), (7, 1), special_move = 'promotion', is_capture = True)
+    new_board = board.copy_and_execute_move(move)
+    
+    assert len(new_board.pieces) == 3
+    assert isinstance(new_board.get_piece_by_position((7, 1)), Queen)
+
+def board_state(board):
+    return (sorted((piece.position, piece.rep(), getattr(piece, 'can_castle', None)) for piece in board.pieces),
+            board.next_move_color, board.en_passant, board.last_move, board.castling)
+
+def test_make_and_unmake_restore_board():
+    board = Board()
+    King(board, (0, 4), 'white')
+    Rook(board, (0, 0), 'white')
+    Rook(board, (0, 7), 'white')
+    Pawn(board, (6, 1), 'white')
+    Pawn(board, (4, 3), 'white')
+    King(board, (7, 4), 'black')
+    Rook(board, (7, 0), 'black')
+    Pawn(board, (6, 2), 'black')
+    Pawn(board, (6, 7), 'black')
+    board.next_move_color = 'black'
+    
+    before = board_state(board)
+    for move in board.get_move_list_for_color('black'):
+        board.make_move(move)
+        for reply in board.get_move_list_for_color('white'):
+            board.make_move(reply)
+            assert board.castling == board.castling_rights()
+            board.unmake_move()
+        assert board.castling == board.castling_rights()
+        board.unmake_move()
+        
+        assert board_state(board) == before
+    
+    assert len(board.history) == 0
+
+def test_move_list_matches_board_moves():
+    board = Board()
+    king = King(board, (0, 4), 'white')
+    Rook(board, (0, 0), 'white')
+    Queen(board, (6, 4), 'black')
+    King(board, (7, 7), 'black')
+    
+    moves = board.get_move_list_for_color('white')
+    boards = [move for move in board.get_moves_for_color('white')]
+    
+    assert len(moves) == len(boards)
+    assert not any(move.special_move == 'castling' for move in moves)
+
+def test_zobrist_key_of_transposition():
+    board = Board()
+    King(board, (0, 4), 'white')
+    Knight(board, (0, 1), 'white')
+    Knight(board, (0, 6), 'white')
+    King(board, (7, 4), 'black')
+    Knight(board, (7, 1), 'black')
+    
+    key = board.zobrist_key()
+    
+    for first, second in [(((0, 1), (2, 2)), ((0, 6), (2, 5))), (((0, 6), (2, 5)), ((0, 1), (2, 2)))]:
+        board.make_move(Move(*first))
+        board.make_move(Move((7, 1), (5, 2)))
+        board.make_move(Move(*second))
+        keys = board.zobrist_key()
+        board.unmake_move()
+        board.unmake_move()
+        board.unmake_move()
+        
+        assert board.zobrist_key() == key
+    
+    board.make_move(Move((0, 1), (2, 2)))
+    board.make_move(Move((7, 1), (5, 2)))
+    board.make_move(Move((0, 6), (2, 5)))
+    
+    assert board.zobrist_key() == keys
+    assert board.zobrist_key() != key
+
+def test_zobrist_key_castling_and_en_passant():
+    board = Board()
+    King(board, (0, 4), 'white')
+    Rook(board, (0, 7), 'white')
+    Pawn(board, (1, 3), 'white')
+    King(board, (7, 4), 'black')
+    
+    key = board.zobrist_key()
+    board.make_move(Move((0, 4), (0, 5)))
+    board.make_move(Move((7, 4), (7, 5)))
+    board.make_move(Move((0, 5), (0, 4)))
+    board.make_move(Move((7, 5), (7, 4)))
+    
+    # Same placement and side to move, but white has lost castling rights
+    assert board.zobrist_key() != key
+    
+    board = Board()
+    King(board, (0, 4), 'white')
+    Pawn(board, (1, 3), 'white')
+    King(board, (7, 4), 'black')
+    double = board.copy_and_execute_move(Move((1, 3), (3, 3), special_move = 'pawn_double'))
+    
+    board = Board()
+    King(board, (0, 4), 'white')
+    Pawn(board, (3, 3), 'white')
+    King(board, (7, 4), 'black')
+    board.next_move_color = 'black'
+    
+    # Same placement and side to move, but only one has an en passant file
+    assert double.zobrist_key() != board.zobrist_key()
+    
+def test_transposition_table_replacement():
+    table = TranspositionTable(size_mb = 0)
+    table.new_search()
+    table.store(1, 5, EXACT, 10, None)
+    table.store(2, 3, EXACT, 20, None)
+    
+    assert table.probe(1)[3] == 10
+    assert table.probe(2) is None
+    
+    table.new_search()
+    table.store(2, 3, EXACT, 20, None)
+    
+    assert table.probe(2)[3] == 20
+    
+    table = TranspositionTable(size_mb = 0, replacement = 'always')
+    table.store(1, 5, EXACT, 10, None)
+    table.store(2, 3, LOWER_BOUND, 20, None)
+    
+    assert table.probe(1) is None
+    assert table.probe(2)[2] == LOWER_BOUND
+    assert table.hits == 1
+
+def test_search_fills_transposition_table():
+    board = Board()
+    King(board, (0, 0), 'white')
+    King(board, (2, 1), 'black')
+    Rook(board, (0, 7), 'black')
+    board.next_move_color = 'black'
+    
+    table = TranspositionTable(size_mb = 1)
+    evaluation = board.evaluate(depth = 3, transposition_table = table)
+    
+    assert evaluation['value'] > 10000
+    assert table.probe(board.zobrist_key())[4] == evaluation['move']
+
+def test_iterative_deepening_stops_in_time():
+    board = Board()
+    King(board, (0, 4), 'white')
+    Queen(board, (0, 3), 'white')
+    Rook(board, (0, 0), 'white')
+    Knight(board, (0, 6), 'white')
+    King(board, (7, 4), 'black')
+    Queen(board, (7, 3), 'black')
+    Rook(board, (7, 7), 'black')
+    Bishop(board, (7, 2), 'black')
+    
+    before = board_state(board)
+    depths = []
+    start = time.time()
+    evaluation = board.iterative_deepening(0.5, max_depth = 20, callback = lambda result: depths.append(result['depth']))
+    
+    assert time.time() - start < 1.5
+    assert evaluation['depth'] == depths[-1] < 20
+    assert evaluation['move'] in board.get_move_list_for_color('white')
+    assert board_state(board) == before
+    assert len(board.history) == 0
+
+def test_iterative_deepening_completes_first_iteration():
+    board = Board()
+    King(board, (0, 4), 'white')
+    Queen(board, (0, 3), 'white')
+    King(board, (7, 4), 'black')
+    
+    evaluation = board.iterative_deepening(0)
+    
+    assert evaluation['depth'] == 1
+    assert evaluation['move'] is not None
+    
+def test_allocate_time():
+    assert allocate_time(60) == 2
+    assert allocate_time(60, moves_to_go = 10) == 6
+    assert allocate_time(60, increment = 4, moves_to_go = 10) == 9
+    assert allocate_time(0.5, increment = 4) < 0.5
+
+def test_move_ordering_improves_first_move_cutoffs():
+    results = []
+    for move_ordering in [False, True]:
+        board = Board()
+        King(board, (0, 6), 'white')
+        Queen(board, (0, 3), 'white')
+        Rook(board, (0, 0), 'white')
+        Knight(board, (2, 2), 'white')
+        Pawn(board, (1, 5), 'white')
+        Pawn(board, (1, 6), 'white')
+        King(board, (7, 6), 'black')
+        Queen(board, (4, 3), 'black')
+        Rook(board, (7, 7), 'black')
+        Bishop(board, (4, 1), 'black')
+        Pawn(board, (6, 6), 'black')
+        
+        search = Search(board)
+        search.move_ordering = move_ordering
+        evaluation = search.iterative_deepening(max_depth = 3)
+        results.append((search.first_move_cutoff_rate(), search.nodes, evaluation['value']))
+    
+    assert results[1][0] > results[0][0]
+    assert results[1][1] < results[0][1]
+    assert results[1][2] == results[0][2]
+
+def test_order_moves_captures_first():
+    board = Board()
+    King(board, (0, 0), 'white')
+    Queen(board, (3, 3), 'white')
+    Pawn(board, (4, 2), 'white')
+    Knight(board, (5, 5), 'black')
+    Rook(board, (5, 3), 'black')
+    King(board, (7, 6), 'black')
+    
+    search = Search(board)
+    moves = board.get_move_list_for_color('white')
+    search.order_moves(moves, None, 0)
+    
+    # Pawn takes rook before queen takes rook before queen takes knight
+    assert [(move.origin, move.target) for move in moves[:3]] == [((4, 2), (5, 3)), ((3, 3), (5, 3)), ((3, 3), (5, 5))]
+    assert not any(move.is_capture for move in moves[3:])
+
+def test_quiescence_avoids_horizon_blunder():
+    moves = []
+    for quiescence in [False, True]:
+        board = Board()
+        King(board, (0, 0), 'white')
+        Queen(board, (3, 3), 'white')
+        King(board, (7, 7), 'black')
+        Pawn(board, (4, 4), 'black')
+        Pawn(board, (5, 5), 'black')
+        
+        search = Search(board)
+        search.quiescence = quiescence
+        moves.append(search.search_root(1)['move'])
+    
+    assert moves[0] == Move((3, 3), (4, 4), is_capture = True)
+    assert moves[1] != Move((3, 3), (4, 4), is_capture = True)
+
+def test_delta_pruning_saves_quiescence_nodes():
+    nodes = []
+    for delta_pruning in [False, True]:
+        board = Board()
+        King(board, (0, 6), 'white')
+        Queen(board, (3, 3), 'white')
+        Rook(board, (0, 4), 'white')
+        Knight(board, (2, 2), 'white')
+        Pawn(board, (3, 4), 'white')
+        King(board, (7, 6), 'black')
+        Queen(board, (5, 5), 'black')
+        Rook(board, (7, 3), 'black')
+        Pawn(board, (4, 3), 'black')
+        Pawn(board, (4, 5), 'black')
+        Pawn(board, (6, 1), 'black')
+        
+        search = Search(board)
+        search.delta_pruning = delta_pruning
+        search.search_root(2)
+        nodes.append(search.quiescence_nodes)
+    
+    assert 0 < nodes[1] < nodes[0]
+
+def test_search_value_does_not_depend_on_window():
+    board = Board.from_fen('8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1')
+    board.make_move(board.smith_to_move('b4c4'))
+    value = Search(board).negamax(1, -chessy3.INFINITY, chessy3.INFINITY, 1)
+    
+    # Fail-soft bounds must not cross the value of the full window search
+    for α, β in [(-chessy3.INFINITY, value + 1), (value - 1, chessy3.INFINITY), (-chessy3.INFINITY, 31), (value - 100, value - 50), (value + 50, value + 100)]:
+        bounded = Search(board).negamax(1, α, β, 1)
+        if bounded <= α:
+            assert value <= bounded
+        elif bounded >= β:
+            assert value >= bounded
+        else:
+            assert bounded == value
+    
+def test_static_exchange_evaluation():
+    board = Board()
+    King(board, (0, 0), 'white')
+    Rook(board, (0, 4), 'white')
+    Pawn(board, (3, 2), 'white')
+    King(board, (7, 7), 'black')
+    Pawn(board, (4, 4), 'black')
+    Pawn(board, (5, 3), 'black')
+    Knight(board, (4, 1), 'black')
+    
+    assert board.static_exchange_evaluation(Move((0, 4), (4, 4), is_capture = True)) == 100 - 479
+    assert board.static_exchange_evaluation(Move((3, 2), (4, 1), is_capture = True)) == 280
+
+def test_incremental_evaluation(monkeypatch):
+    monkeypatch.setattr(chessy3, 'DEBUG_EVALUATION', True)
+    board = Board()
+    King(board, (0, 4), 'white')
+    Rook(board, (0, 0), 'white')
+    Pawn(board, (6, 1), 'white')
+    Pawn(board, (4, 3), 'white')
+    King(board, (7, 4), 'black')
+    Rook(board, (7, 7), 'black')
+    Knight(board, (7, 0), 'black')
+    Pawn(board, (6, 2), 'black')
+    board.next_move_color = 'black'
+    
+    score = board.evaluate_full()
+    
+    assert board.score == score
+    
+    for move in board.get_move_list_for_color('black'):
+        board.make_move(move)
+        for reply in board.get_move_list_for_color('white'):
+            board.make_move(reply)
+            
+            assert board.score == board.evaluate_full()
+            
+            board.unmake_move()
+        board.unmake_move()
+    
+    assert board.score == score
+    
+    board.evaluate(depth = 3)
+
+def attacked_by_capture(board, position, color):
+    # Reference for is_attacked: can the opponent capture a piece on position
+    dummy = None
+    if board.get_piece_by_position(position) is None:
+        dummy = Knight(board, position, color)
+    
+    attacked = any(move.target == position and move.is_capture for piece in list(board.get_pieces_by_color(chessy3.opposite_color(color))) for move in piece.pseudo_legal_moves())
+    
+    if dummy is not None:
+        board.remove_piece(dummy)
+    
+    return attacked
+
+def test_is_attacked_matches_captures():
+    board = Board()
+    King(board, (0, 4), 'white')
+    Queen(board, (3, 3), 'white')
+    Rook(board, (0, 0), 'white')
+    Bishop(board, (2, 6), 'white')
+    Knight(board, (4, 5), 'white')
+    Pawn(board, (1, 1), 'white')
+    Pawn(board, (4, 4), 'white')
+    King(board, (7, 6), 'black')
+    Queen(board, (5, 1), 'black')
+    Rook(board, (6, 4), 'black')
+    Bishop(board, (7, 2), 'black')
+    Knight(board, (2, 2), 'black')
+    Pawn(board, (5, 5), 'black')
+    Pawn(board, (3, 0), 'black')
+    
+    for color in ['white', 'black']:
+        for rank in range(8):
+            for file in range(8):
+                piece = board.get_piece_by_position((rank, file))
+                if piece is not None and piece.color != color:
+                    continue
+                
+                assert board.is_attacked((rank, file), color) == attacked_by_capture(board, (rank, file), color)
+
+def test_board_from_fen():
+    board = Board.from_fen('r3k2r/8/8/8/2pP4/8/8/R3K3 b Qk d3 0 1')
+    
+    assert board.next_move_color == 'black'
+    assert isinstance(board.get_piece_by_position((7, 0)), Rook)
+    assert board.get_piece_by_position((3, 2)).color == 'black'
+    assert board.en_passant['black'][3]
+    assert board.castling_rights() == 0b1001
+    assert board.castling == 0b1001
+    assert len(board.pieces) == 7
+
+def test_fen_round_trip():
+    fens = [
+        'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1',
+        'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+        'rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3',
+        '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 b - - 12 40',
+        'r3k2r/8/8/8/8/8/8/R3K2R b Kq - 3 20'
+    ]
+    
+    for fen in fens:
+        assert Board.from_fen(fen).to_fen() == fen
+
+def test_move_counters():
+    board = Board.from_fen('rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1')
+    
+    board.make_move(Move((0, 6), (2, 5)))
+    board.make_move(Move((6, 4), (4, 4), special_move = 'pawn_double'))
+    
+    assert board.to_fen() == 'rnbqkbnr/pppp1ppp/8/4p3/8/5N2/PPPPPPPP/RNBQKB1R w KQkq e6 0 2'
+    
+    board.make_move(Move((2, 5), (0, 6)))
+    
+    assert board.to_fen() == 'rnbqkbnr/pppp1ppp/8/4p3/8/8/PPPPPPPP/RNBQKBNR b KQkq - 1 2'
+    
+    board.unmake_move()
+    board.unmake_move()
+    board.unmake_move()
+    
+    assert board.to_fen() == 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+
+def test_standard_algebraic_notation():
+    board = Board.from_fen('r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1')
+    
+    assert board.move_to_san(Move((0, 4), (0, 6), special_move = 'castling', move_info = chessy3.CASTLING['white'][1])) == 'O-O'
+    assert board.move_to_san(Move((4, 4), (6, 5), is_capture = True)) == 'Nxf7'
+    assert board.move_to_san(Move((2, 2), (3, 0))) == 'Na4'
+    assert board.move_to_san(Move((4, 3), (5, 4), is_capture = True)) == 'dxe6'
+    assert board.move_to_san(Move((2, 5), (2, 7), is_capture = True)) == 'Qxh3'
+    assert board.san_to_move('Qxf6').target == (5, 5)
+    assert board.san_to_move('Kd1').origin == (0, 4)
+    assert board.san_to_move('Qa8') is None
+    
+    board = Board.from_fen('6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1')
+    
+    assert board.move_to_san(board.san_to_move('Ra8')) == 'Ra8#'
+    
+    board = Board.from_fen('k7/8/8/8/8/8/8/KR5R w - - 0 1')
+    
+    assert board.move_to_san(Move((0, 1), (0, 4))) == 'Rbe1'
+
+def test_null_move_is_taken_back():
+    board = Board.from_fen('rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w KQkq e6 0 2')
+    before = board_state(board)
+    key = board.zobrist_key()
+    board.make_null_move()
+    
+    assert board.to_fen() == 'rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 1 2'
+    
+    board.unmake_move()
+    
+    assert board_state(board) == before
+    assert board.zobrist_key() == key
+    assert len(board.history) == 0
+
+def test_selective_search():
+    board = Board.from_fen('6k1/pp3ppp/2p5/8/3r4/2N5/PPP2PPP/3R2K1 w - - 0 1')
+    full_width = Search(board)
+    full_width.null_move_pruning = full_width.late_move_reductions = full_width.check_extensions = False
+    full_width.iterative_deepening(max_depth = 4)
+    selective = Search(board)
+    selective.iterative_deepening(max_depth = 4)
+    
+    assert selective.nodes < full_width.nodes
+    assert selective.null_move_cutoffs > 0 and selective.reductions > 0 and selective.extensions > 0
+    
+    board = Board.from_fen('6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1')
+    
+    assert Search(board).search_root(3)['value'] > chessy3.MATE_THRESHOLD
+    
+    # Only kings and pawns: no null moves because of zugzwang
+    board = Board.from_fen('8/8/p1k5/1p6/1P6/P1K5/8/8 w - - 0 1')
+    search = Search(board)
+    search.search_root(4)
+    
+    assert search.null_move_cutoffs == 0
+
+def test_principal_variation_search():
+    board = Board.from_fen('6k1/pp3ppp/2p5/8/3r4/2N5/PPP2PPP/3R2K1 w - - 0 1')
+    searches = [Search(board), Search(board)]
+    for search in searches:
+        search.null_move_pruning = search.late_move_reductions = search.check_extensions = False
+    searches[0].principal_variation_search = False
+    searches[0].aspiration_window = None
+    searches[1].aspiration_window = 1
+    expected, result = [search.iterative_deepening(max_depth = 4) for search in searches]
+    
+    assert result['value'] == expected['value']
+    assert searches[1].pvs_re_searches > 0 and searches[1].aspiration_re_searches > 0
+    
+    # The principal variation is a line of legal moves starting with the best move
+    assert result['pv'][0] == result['move'] and len(result['pv']) >= 3
+    for move in result['pv']:
+        assert board.smith_to_move(chessy3.move_to_smith(move)) == move
+        board.make_move(move)
+
+def test_search_statistics(tmp_path):
+    board = Board.from_fen('6k1/pp3ppp/2p5/8/3r4/2N5/PPP2PPP/3R2K1 w - - 0 1')
+    table = TranspositionTable(size_mb = 1)
+    board.iterative_deepening(max_depth = 2, transposition_table = table)
+    search = Search(board, table)
+    search.instrumentation = chessy3.Instrumentation()
+    search.profiler = chessy3.cProfile.Profile()
+    search.statistics_file = str(tmp_path / 'statistics.jsonl')
+    result = search.measure(search.iterative_deepening, None, 3)
+    statistics = result['statistics']
+    
+    assert statistics['nodes'] == search.nodes > statistics['quiescence_nodes'] > 0
+    assert statistics['nps'] > 0 and 0 < statistics['first_move_cutoff_rate'] <= 1
+    # Only probes of this search count
+    assert statistics['tt_probes'] < table.probes and 0 < statistics['tt_hit_rate'] < 1
+    assert statistics['functions']['attack_tests']['calls'] > 0
+    # Quiescence nodes generate captures only
+    assert statistics['functions']['capture_generation']['calls'] > statistics['functions']['move_generation']['calls']
+    assert statistics['functions']['quiet_generation']['calls'] > 0 and statistics['functions']['move_lookup']['calls'] > 0
+    assert statistics['functions']['make_move']['calls'] == statistics['functions']['unmake_move']['calls']
+    assert statistics['functions']['board_copies']['calls'] == 0
+    assert any('negamax' in entry['function'] for entry in statistics['profile'])
+    # The timers are removed after the search
+    assert Board.is_attacked.__name__ == 'is_attacked'
+    assert board.evaluate(depth = 2)['statistics']['nodes'] > 0
+    
+    search.measure(search.search_root, 2)
+    with open(tmp_path / 'statistics.jsonl') as statistics_file:
+        records = [chessy3.json.loads(line) for line in statistics_file]
+    
+    assert [record['depth'] for record in records] == [3, None]
+    assert records[0]['move'] == chessy3.move_to_smith(result['move']) and records[0]['fen'] == board.to_fen()
+
+def test_packed_moves():
+    board = Board.from_fen('r3k2r/1P6/8/3pP3/8/8/8/R3K2R w KQkq d6 0 1')
+    moves = board.get_move_list_for_color('white')
+    packed_moves = [chessy3.pack_move(move) for move in moves]
+    
+    assert len(set(packed_moves)) == len(moves) and 0 not in packed_moves
+    for move, packed in zip(moves, packed_moves):
+        unpacked = chessy3.unpack_move(packed)
+        assert (unpacked.origin, unpacked.target, unpacked.special_move, unpacked.move_info, unpacked.is_capture) == (move.origin, move.target, move.special_move, move.move_info, move.is_capture)
+        assert chessy3.packed_move_to_smith(packed) == chessy3.move_to_smith(move)
+        assert chessy3.smith_to_packed_move(board, chessy3.move_to_smith(move)) == packed
+    
+    assert chessy3.packed_move_to_smith(chessy3.smith_to_packed_move(board, 'b7a8q')) == 'b7a8q'
+    assert chessy3.smith_to_packed_move(board, 'e1e3') is None
+
+def test_compact_objects():
+    board = Board.from_fen(chessy3.START_FEN)
+    move = board.get_move_list_for_color('white')[0]
+    board.make_move(move)
+    
+    for item in [move, board.history[-1]] + list(board.pieces):
+        assert not hasattr(item, '__dict__')
+    assert chessy3.opposite_color('white') == 'black' and chessy3.opposite_color('black') == 'white'
+
+def test_staged_move_generation(monkeypatch):
+    board = Board.from_fen('r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1')
+    search = Search(board)
+    hash_move = board.smith_to_move('e2a6')
+    killer = board.smith_to_move('a2a3')
+    search.killers[2] = [killer, Move((0, 0), (5, 0))]
+    moves = list(search.staged_moves(hash_move, 2))
+    captures = [move for move in moves if move.is_capture]
+    
+    assert set(moves) == set(board.get_move_list_for_color('white', False)) and len(moves) == len(set(moves))
+    # Hash move, captures, the killer that can be played here, then quiet moves
+    assert moves[0] == hash_move and moves[1:len(captures)] == [move for move in captures if move != hash_move]
+    assert moves[len(captures)] == killer and killer not in moves[len(captures) + 1:]
+    assert search.quiet_stages == 1
+    
+    # The quiet stage generates no captures, in the order of the full list
+    for move_generator in ['bitboard', 'mailbox']:
+        board.move_generator = move_generator
+        quiet_moves = [move for move in board.get_move_list_for_color('white', False) if not move.is_capture]
+        
+        assert board.get_quiet_list_for_color('white') == quiet_moves
+    
+    monkeypatch.setattr(Board, 'get_move_list_for_color', None)
+    
+    assert board.get_quiet_list_for_color('white') == quiet_moves
+    
+    monkeypatch.undo()
+    
+    eager = Search(board)
+    eager.staged_move_generation = False
+    
+    assert Search(board).search_root(3)['value'] == eager.search_root(3)['value']
+    
+    # A hash move causing a cutoff saves generating the other moves
+    board = Board.from_fen('6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1')
+    search = Search(board)
+    search.search_root(3)
+    
+    assert search.quiet_stages < search.nodes - search.quiescence_nodes
+
+def test_repetition_and_fifty_move_draws():
+    board = Board.from_fen(chessy3.START_FEN)
+    shuffle = ['g1f3', 'g8f6', 'f3g1', 'f6g8']
+    for notation in shuffle:
+        assert not board.is_repetition()
+        board.make_move(board.smith_to_move(notation))
+    
+    assert board.is_repetition() and not board.is_repetition(2)
+    
+    for notation in shuffle:
+        board.make_move(board.smith_to_move(notation))
+    
+    assert board.is_repetition(2)
+    
+    # The positions before a pawn move cannot come back
+    for notation in ['e2e4', 'g8f6', 'g1f3', 'f6g8', 'f3g1', 'g8f6']:
+        board.make_move(board.smith_to_move(notation))
+    
+    assert board.is_repetition() and not board.is_repetition(2)
+    
+    board = Board.from_fen('6k1/8/8/8/8/8/8/R5K1 w - - 99 80')
+    
+    assert not board.is_draw()
+    
+    board.make_move(board.smith_to_move('a1a2'))
+    
+    assert board.is_fifty_move_draw() and board.is_draw()
+
+def test_search_scores_repetitions_as_draws():
+    board = Board.from_fen('6k1/5ppp/8/8/8/8/5PPP/R5K1 w - - 0 1')
+    for notation in ['a1b1', 'g8h8', 'b1a1', 'h8g8']:
+        board.make_move(board.smith_to_move(notation))
+    search = Search(board)
+    
+    assert search.negamax(2, -chessy3.INFINITY, chessy3.INFINITY, 1) == chessy3.DRAW_VALUE
+    assert search.draws == 1
+    
+    # At the root the repetition is not claimed, the mate is found
+    assert search.search_root(3)['value'] > chessy3.MATE_THRESHOLD
+
+def test_pawn_structure():
+    # White: isolated passed pawns on a6 and doubled on c4 and c3. Black:
+    # isolated passed pawn on h4.
+    board = Board.from_fen('4k3/8/P7/8/2P4p/2P5/8/4K3 w - - 0 1')
+    
+    assert board.pawn_structure_score() == (60 + 20 + 10 - 15 - 3 * 10) - (35 - 10)
+    assert board.evaluate()['value'] == board.score + board.pawn_structure_score()
+    
+    board = Board.from_fen('4k3/3ppp2/8/8/8/8/3PPP2/4K3 w - - 0 1')
+    
+    assert board.pawn_structure_score() == 0
+
+def test_pawn_hash_table():
+    board = Board.from_fen('r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1')
+    board.pawn_table = chessy3.PawnTable(size_mb = 1)
+    key = board.pawn_hash
+    
+    board.make_move(board.smith_to_move('e5g4'))
+    
+    assert board.pawn_hash == key
+    
+    board.make_move(board.smith_to_move('b4c3'))
+    
+    assert board.pawn_hash != key
+    assert board.pawn_hash == Board.from_fen(board.to_fen()).pawn_hash
+    
+    board.unmake_move()
+    board.unmake_move()
+    
+    assert board.pawn_hash == key
     
+    result = board.evaluate(depth = 3)
+    statistics = result['statistics']
     
-    
\ No newline at end of file
+    assert 0 < statistics['pawn_probes'] <= board.pawn_table.probes
+    assert 0.5 < statistics['pawn_hit_rate'] < 1
@@ -0,0 +1,26 @@
+from epd import parse_epd, run_suite
+
+SUITE = '''
+# Mate in one and a free queen
+6k1/5ppp/8/8/8/8/8/R5K1 w - - bm Ra8#; id "back rank mate";
+4k3/8/8/3q4/8/8/3R4/4K3 w - - bm Rxd5; id "free queen";
+4k3/8/8/8/3p4/2p5/3Q4/4K3 w - - am Qxd4; id "defended pawn";
+'''
+
+def test_parse_epd():
+    board, operations = parse_epd('6k1/5ppp/8/8/8/8/8/R5K1 w - - bm Ra8# Re1; id "back rank mate";')
+    
+    assert board.next_move_color == 'white'
+    assert operations['bm'] == ['Ra8#', 'Re1']
+    assert operations['id'] == ['back rank mate']
+
+def test_run_suite():
+    results = []
+    summary = run_suite(SUITE.splitlines(), max_depth = 2, callback = results.append)
+    
+    assert summary['positions'] == 3
+    assert summary['solved'] == 3
+    assert summary['solve_rate'] == 1
+    assert [result['id'] for result in results] == ['back rank mate', 'free queen', 'defended pawn']
+    assert results[0]['move'] == 'Ra8'
+    assert summary['nodes'] == sum(result['nodes'] for result in results)
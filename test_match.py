@@ -0,0 +1,87 @@
+import pytest
+
+import chessy3
+
+from match import Player, parse_engine, play_game, game_to_pgn, elo_difference, sprt, run_match
+
+def test_parse_engine():
+    engine = parse_engine('name=base depth=3 time=0.5 null_move_pruning=false PAWN_STRUCTURE=false', 'first')
+    
+    assert engine == {'name': 'base', 'depth': 3, 'time': 0.5, 'options': {'null_move_pruning': False, 'PAWN_STRUCTURE': False}}
+    assert parse_engine('', 'second')['name'] == 'second'
+    
+    with pytest.raises(ValueError):
+        parse_engine('null_move_prunning=false', 'first')
+
+def test_play_game():
+    engine = parse_engine('depth=2', 'engine')
+    
+    assert play_game('6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1', engine, engine) == ('1-0', 'checkmate', ['Ra8#'])
+    assert play_game('8/8/4k3/8/8/4K3/8/8 w - - 0 1', engine, engine) == ('1/2-1/2', 'insufficient material', [])
+    
+    # Settings of an engine only apply to its own moves
+    pawn_structure = parse_engine('depth=1 PAWN_STRUCTURE=false', 'engine')
+    play_game('4k3/pppp4/8/8/8/8/PPPP4/4K3 w - - 0 1', pawn_structure, engine)
+    
+    assert chessy3.PAWN_STRUCTURE
+
+def test_player_settings():
+    player = Player(parse_engine('depth=2 MOVE_GENERATOR="bitboard" LEGALITY_CHECK="make" HASH_SIZE_MB=1 PAWN_HASH_SIZE_MB=0', 'engine'))
+    board = chessy3.Board.from_fen('6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1')
+    
+    assert len(player.transposition_table.entries) < len(chessy3.TranspositionTable().entries)
+    assert len(player.pawn_table.entries) < len(chessy3.PawnTable().entries)
+    assert player.search(board)['move'] == board.smith_to_move('a1a8')
+    assert (board.move_generator, board.legality_check) == ('bitboard', 'make')
+    assert (chessy3.MOVE_GENERATOR, chessy3.HASH_SIZE_MB) == ('mailbox', 16)
+
+def test_game_to_pgn():
+    game = {
+        'event': 'test',
+        'date': '2024.01.01',
+        'round': 2,
+        'white': 'first',
+        'black': 'second',
+        'result': '1/2-1/2',
+        'termination': 'adjudication',
+        'fen': 'rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1',
+        'moves': ['e5', 'Nf3', 'Nc6']
+    }
+    pgn = game_to_pgn(game)
+    
+    assert '[FEN "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1"]' in pgn
+    assert pgn.endswith('\n\n1... e5 2. Nf3 Nc6 1/2-1/2\n\n')
+    
+    game.update(fen = chessy3.START_FEN, moves = ['e4', 'e5'] * 20)
+    pgn = game_to_pgn(game)
+    
+    assert 'SetUp' not in pgn and '\n\n1. e4 e5 2. e4' in pgn
+    assert all(len(line) <= 80 for line in pgn.split('\n'))
+
+def test_elo_and_sprt():
+    elo, margin = elo_difference(60, 20, 20)
+    
+    assert round(elo, 1) == 147.2 and 0 < margin < elo
+    assert elo_difference(10, 0, 0) == (None, None)
+    assert elo_difference(50, 0, 50)[0] == 0
+    
+    assert sprt(0, 0, 0)['result'] is None
+    assert sprt(30, 40, 30)['result'] is None
+    assert sprt(300, 400, 100)['result'] == 'H1'
+    assert sprt(100, 400, 300)['result'] == 'H0'
+    assert sprt(300, 400, 100, elo0 = 0, elo1 = 5)['llr'] < sprt(300, 400, 100)['llr']
+
+def test_run_match(tmp_path):
+    first = parse_engine('name=first depth=2', 'first')
+    second = parse_engine('name=second depth=1', 'second')
+    openings = ['6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1', '8/8/4k3/8/8/4K3/8/8 w - - 0 1']
+    pgn_path = tmp_path / 'games.pgn'
+    summary = run_match(first, second, openings, processes = 2, pgn_path = str(pgn_path))
+    
+    # Every opening is played with both colors
+    assert summary['games'] == 4
+    assert [game['round'] for game in summary['results']] == [1, 2, 3, 4]
+    assert [game['white'] for game in summary['results']] == ['first', 'second', 'first', 'second']
+    assert summary['results'][0]['result'] == '1-0' and summary['results'][3]['result'] == '1/2-1/2'
+    assert summary['wins'] + summary['draws'] + summary['losses'] == 4
+    assert pgn_path.read_text().count('[Event "first vs second"]') == 4
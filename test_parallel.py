@@ -0,0 +1,72 @@
+import threading
+
+from chessy3 import Board, Search
+from parallel import ParallelSearch, benchmark
+from uci import UCIEngine
+
+def test_parallel_search_matches_single_process():
+    fens = [
+        'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+        '6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1'
+    ]
+    
+    with ParallelSearch(2) as parallel:
+        for fen in fens:
+            board = Board.from_fen(fen)
+            single = Search(board).search_root(2)
+            multi = parallel.search_root(board, 2)
+            
+            assert multi['value'] == single['value']
+            assert board.to_fen() == fen
+        
+        assert multi['move'] == board.smith_to_move('a1a8')
+        assert parallel.nodes > 0
+
+def test_parallel_iterative_deepening():
+    board = Board.from_fen('r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10')
+    depths = []
+    
+    with ParallelSearch(2) as parallel:
+        result = parallel.iterative_deepening(board, 0.5, callback = lambda result: depths.append(result['depth']))
+        
+        assert result['depth'] == depths[-1]
+        assert result['move'] in board.get_move_list_for_color('white')
+        assert result['pv'][0] == result['move']
+        
+        stop_event = threading.Event()
+        stop_event.set()
+        
+        assert parallel.iterative_deepening(board, stop_event = stop_event) is None
+
+def test_benchmark_report():
+    report = benchmark(['6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1'], depth = 2, processes = 2)
+    
+    assert report['processes'] == 2
+    assert report['positions'][0]['single']['value'] == report['positions'][0]['parallel']['value']
+    assert report['speedup'] > 0
+
+def test_uci_threads():
+    lines = []
+    engine = UCIEngine(lines.append)
+    engine.handle('setoption name Threads value 2')
+    engine.handle('position fen 6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1')
+    engine.handle('go depth 2')
+    engine.search_thread.join()
+    engine.handle('quit')
+    
+    assert lines[-1] == 'bestmove a1a8'
+
+def test_parallel_search_sees_repetitions():
+    board = Board.from_fen('6k1/5ppp/8/8/8/8/5PPP/R5K1 w - - 0 1')
+    for notation in ['a1b1', 'g8h8', 'b1a1']:
+        board.make_move(board.smith_to_move(notation))
+    fen = board.to_fen()
+    single = Search(board).search_root(3)
+    
+    with ParallelSearch(2) as parallel:
+        multi = parallel.search_root(board, 3)
+    
+    # Going back to g8 repeats the starting position
+    assert single['value'] == multi['value'] == 0
+    assert multi['move'] == board.smith_to_move('h8g8')
+    assert board.to_fen() == fen and len(board.history) == 3
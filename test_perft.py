@@ -0,0 +1,57 @@
+from chessy3 import Board, move_to_smith
+from perft import REFERENCE_POSITIONS, perft, divide, run_benchmark
+
+def test_reference_positions():
+    result = run_benchmark(max_depth = 2)
+    
+    assert len(result['positions']) == len(REFERENCE_POSITIONS)
+    assert result['passed']
+    assert result['nodes'] == sum(position['nodes'][min(2, len(position['nodes'])) - 1] for position in REFERENCE_POSITIONS)
+
+def test_perft_start_position():
+    board = Board.from_fen('rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1')
+    
+    assert perft(board, 3) == 8902
+    assert len(board.history) == 0
+
+def test_divide():
+    board = Board.from_fen('r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1')
+    result = divide(board, 2)
+    
+    assert len(result) == 26
+    assert sum(result.values()) == 568
+    assert 'e1g1' in result and 'e1c1' in result
+
+def test_legal_generator_matches_make_and_test():
+    assert run_benchmark(max_depth = 2, legality_check = 'make')['nodes'] == run_benchmark(max_depth = 2, legality_check = 'pins')['nodes']
+
+def test_legal_generator_corner_cases():
+    positions = [
+        # En passant would expose the king on the rank
+        ('8/8/8/KPp4r/8/8/8/7k w - c6 0 1', 'b5c6', False),
+        # En passant captures the checking pawn
+        ('8/8/8/2k5/3Pp3/8/8/4K3 b - d3 0 1', 'e4d3', True),
+        # Castling through and into an attacked square, and out of check
+        ('4k3/8/8/8/8/8/5r2/R3K2R w KQ - 0 1', 'e1g1', False),
+        ('4k3/8/8/8/8/8/3r4/R3K2R w KQ - 0 1', 'e1c1', False),
+        ('4k3/8/8/8/8/8/1r6/R3K2R w KQ - 0 1', 'e1c1', True),
+        ('4k3/4r3/8/8/8/8/8/R3K2R w KQ - 0 1', 'e1g1', False),
+        # Double check, only the king can move
+        ('4k3/8/8/8/1b6/8/R3r3/4K3 w - - 0 1', 'a2e2', False),
+        # Pinned pieces only move along the pin
+        ('4k3/4r3/8/8/8/8/4R3/4K3 w - - 0 1', 'e2e7', True),
+        ('4k3/4r3/8/8/8/8/4R3/4K3 w - - 0 1', 'e2d2', False),
+        # The king can not step back along the line of a slider
+        ('4k3/8/8/8/8/8/8/r3K3 w - - 0 1', 'e1f1', False),
+        ('4k3/8/8/8/8/8/8/r3K3 w - - 0 1', 'e1e2', True)
+    ]
+    
+    for fen, notation, legal in positions:
+        board = Board.from_fen(fen)
+        moves = [move for move in board.get_move_list_for_color(board.next_move_color) if move_to_smith(move) == notation]
+        
+        assert bool(moves) == legal, fen
+        
+        board.legality_check = 'make'
+        
+        assert [move for move in board.get_move_list_for_color(board.next_move_color) if move_to_smith(move) == notation] == moves
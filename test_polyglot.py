@@ -0,0 +1,86 @@
+import polyglot
+from chessy3 import Board, START_FEN
+from polyglot import OpeningBook, ENTRY
+from uci import UCIEngine
+
+def book_move(notation):
+    files = 'abcdefgh'
+    return files.index(notation[2]) | (int(notation[3]) - 1) << 3 | files.index(notation[0]) << 6 | (int(notation[1]) - 1) << 9 | ('nbrq'.index(notation[4]) + 1 if len(notation) > 4 else 0) << 12
+
+def write_book(path, entries):
+    with open(path, 'wb') as book:
+        for key, notation, weight in sorted(entries, key = lambda entry: entry[0]):
+            book.write(ENTRY.pack(key, book_move(notation), weight, 0))
+    return str(path)
+
+def test_polyglot_keys():
+    # Reference keys of the Polyglot book format documentation
+    games = [
+        [('e2e4', 0x823c9b50fd114196), ('d7d5', 0x0756b94461c50fb0), ('e4e5', 0x662fafb965db29d4), ('f7f5', 0x22a48b5a8e47ff78), ('e1e2', 0x652a607ca3f242c1), ('e8f7', 0x00fdd303c946bdd9)],
+        [('a2a4', None), ('b7b5', None), ('h2h4', None), ('b5b4', None), ('c2c4', 0x3c8123ea7b067637), ('b4c3', None), ('a1a3', 0x5c3f9b829b279560)]
+    ]
+    
+    board = Board.from_fen(START_FEN)
+    assert board.polyglot_key() == 0x463b96181691fc9c
+    
+    for game in games:
+        board = Board.from_fen(START_FEN)
+        for notation, key in game:
+            board.make_move(board.smith_to_move(notation))
+            if key is not None:
+                assert board.polyglot_key() == key
+                assert Board.from_fen(board.to_fen()).polyglot_key() == key
+
+def test_book_moves(tmp_path):
+    start = Board.from_fen(START_FEN)
+    castling = Board.from_fen('r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1')
+    promotion = Board.from_fen('8/P6k/8/8/8/8/8/K7 w - - 0 1')
+    path = write_book(tmp_path / 'book.bin', [
+        (start.polyglot_key(), 'e2e4', 10),
+        (start.polyglot_key(), 'd2d4', 30),
+        (start.polyglot_key(), 'e2e5', 50),
+        (castling.polyglot_key(), 'e1h1', 1),
+        (promotion.polyglot_key(), 'a7a8n', 5),
+        (promotion.polyglot_key(), 'a7a8q', 1),
+        (1, 'a2a3', 1),
+        (2 ** 64 - 1, 'a2a3', 1)
+    ])
+    
+    with OpeningBook(path, 'best') as book:
+        # Illegal moves are skipped
+        assert [weight for move, weight in book.moves(start)] == [10, 30]
+        assert book.find_move(start) == start.smith_to_move('d2d4')
+        assert book.find_move(castling) == castling.smith_to_move('e1g1')
+        assert book.find_move(promotion) == promotion.smith_to_move('a7a8q')
+        assert book.find_move(Board.from_fen('4k3/8/8/8/8/8/8/4K3 w - - 0 1')) is None
+    
+    with OpeningBook(path, seed = 1) as book:
+        moves = [polyglot.move_to_notation(book_move(notation)) for notation in ['e2e4', 'a7a8q']]
+        assert moves == ['e2e4', 'a7a8q']
+        assert {book.find_move(start).target for index in range(50)} == {(3, 4), (3, 3)}
+    
+    with OpeningBook(write_book(tmp_path / 'empty.bin', [])) as book:
+        assert book.find_move(start) is None
+
+def test_uci_book(tmp_path):
+    board = Board.from_fen(START_FEN)
+    path = write_book(tmp_path / 'book.bin', [(board.polyglot_key(), 'g1f3', 1)])
+    lines = []
+    engine = UCIEngine(lines.append)
+    engine.handle('uci')
+    
+    assert 'option name OwnBook type check default true' in lines
+    
+    engine.handle('setoption name BookFile value ' + path)
+    engine.handle('position startpos')
+    engine.handle('go depth 2')
+    engine.search_thread.join()
+    
+    assert lines[-1] == 'bestmove g1f3'
+    
+    engine.handle('setoption name OwnBook value false')
+    engine.handle('go depth 1')
+    engine.search_thread.join()
+    engine.handle('quit')
+    
+    assert lines[-2].startswith('info depth 1')
@@ -0,0 +1,96 @@
+import multiprocessing
+import subprocess
+import sys
+
+from chessy3 import Board, Move, SharedTranspositionTable, CASTLING, EXACT, LOWER_BOUND, UPPER_BOUND
+from parallel import ParallelSearch
+
+def test_shared_table_entries():
+    with SharedTranspositionTable(size_mb = 1) as table:
+        castling = Move((7, 4), (7, 6), special_move = 'castling', move_info = CASTLING['black'][1])
+        promotion = Move((6, 1), (7, 0), special_move = 'promotion', is_capture = True)
+        table.new_search()
+        table.store(1, 5, EXACT, -10050, castling)
+        table.store(2, 0, UPPER_BOUND, 99999, promotion)
+        table.store(3, 1, LOWER_BOUND, 0, None)
+
+        key, depth, bound, value, move, generation = table.probe(1)
+        assert (key, depth, bound, value, generation) == (1, 5, EXACT, -10050, 1)
+        assert move == castling and move.move_info is CASTLING['black'][1]
+        assert table.probe(2)[1:5] == (0, UPPER_BOUND, 99999, promotion)
+        assert table.probe(3)[4] is None
+        assert table.probe(4) is None
+
+        table.clear()
+
+        assert table.probe(1) is None
+        assert table.hits == 3
+
+def test_shared_table_replacement():
+    with SharedTranspositionTable(size_mb = 0) as table:
+        table.new_search()
+        table.store(1, 5, EXACT, 10, None)
+        table.store(2, 3, EXACT, 20, None)
+
+        assert table.probe(1)[3] == 10
+        assert table.probe(2) is None
+
+        table.new_search()
+        table.store(2, 3, EXACT, 20, None)
+
+        assert table.probe(2)[3] == 20
+
+def test_torn_entry_reads_as_miss():
+    with SharedTranspositionTable(size_mb = 0) as table:
+        table.store(1, 5, EXACT, 10, None)
+
+        # Data word of a second writer landing between the two words of the first
+        table.words[3] ^= 1 << 24
+
+        assert table.probe(1) is None
+
+def store_entries(table, keys):
+    for key in keys:
+        table.store(key, 1, EXACT, key, None)
+
+def test_entries_are_shared_between_processes():
+    with SharedTranspositionTable(size_mb = 1) as table:
+        workers = [multiprocessing.Process(target = store_entries, args = (table, range(start, 1000, 2))) for start in range(2)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        assert all(table.probe(key)[3] == key for key in range(1000))
+
+        # Another program attaching by name
+        code = 'from chessy3 import SharedTranspositionTable, EXACT\n' \
+            'table = SharedTranspositionTable.attach(%r)\n' \
+            'print(table.probe(7)[3])\n' \
+            'table.store(5000, 2, EXACT, 42, None)\n' \
+            'table.close()' % table.name
+        output = subprocess.run([sys.executable, '-c', code], capture_output = True, text = True, check = True)
+
+        assert output.stdout.strip() == '7'
+        assert output.stderr == ''
+        assert table.probe(5000)[3] == 42
+
+        board = Board.from_fen('6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1')
+        evaluation = board.evaluate(depth = 2, transposition_table = table)
+
+        assert table.probe(board.zobrist_key())[4] == evaluation['move']
+
+def test_parallel_search_shares_table():
+    board = Board.from_fen('r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1')
+
+    with ParallelSearch(2, hash_size_mb = 1) as parallel:
+        first = parallel.search_root(board, 2)
+        nodes = parallel.nodes
+        second = parallel.search_root(board, 2)
+
+        assert second['value'] == first['value']
+        assert parallel.nodes - nodes < nodes
+
+    with ParallelSearch(2, shared_table = False) as parallel:
+        assert parallel.table is None
+        assert parallel.search_root(board, 2)['value'] == first['value']
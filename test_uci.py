@@ -0,0 +1,117 @@
+import time
+
+from uci import UCIEngine
+from chessy3 import HASH_SIZE_MB
+
+def test_handshake_and_options():
+    lines = []
+    engine = UCIEngine(lines.append)
+    
+    engine.handle('uci')
+    engine.handle('setoption name Hash value 2')
+    engine.handle('setoption name Threads value 4')
+    engine.handle('isready')
+    
+    assert lines[0].startswith('id name')
+    assert 'uciok' in lines
+    assert lines[-1] == 'readyok'
+    assert engine.hash_size_mb == 2
+    assert engine.threads == 4
+    assert engine.handle('quit') is False
+
+def test_invalid_options_are_ignored(tmp_path):
+    lines = []
+    engine = UCIEngine(lines.append)
+    
+    engine.handle('setoption name Hash value lots')
+    engine.handle('setoption name Threads value 2.5')
+    engine.handle('setoption name BookFile value ' + str(tmp_path / 'missing.bin'))
+    engine.handle('isready')
+    
+    assert engine.hash_size_mb == HASH_SIZE_MB
+    assert engine.threads == 1
+    assert engine.book is None
+    assert len([line for line in lines if line.startswith('info string')]) == 3
+    assert lines[-1] == 'readyok'
+
+def test_position_with_moves():
+    engine = UCIEngine(lambda line: None)
+    
+    engine.handle('position startpos moves e2e4 e7e5 g1f3')
+    
+    assert engine.board.to_fen() == 'rnbqkbnr/pppp1ppp/8/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R b KQkq - 1 2'
+    
+    engine.handle('position fen 6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1 moves a1a7')
+    
+    assert engine.board.to_fen() == '6k1/R4ppp/8/8/8/8/8/6K1 b - - 1 1'
+
+def test_go_depth():
+    lines = []
+    engine = UCIEngine(lines.append)
+    engine.handle('position fen 6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1')
+    engine.handle('go depth 2')
+    engine.search_thread.join()
+    
+    assert lines[0].startswith('info depth 1 score cp')
+    assert ' nodes ' in lines[0] and ' nps ' in lines[0] and ' pv ' in lines[0]
+    assert lines[-1] == 'bestmove a1a8'
+
+def test_stop_infinite_search():
+    lines = []
+    engine = UCIEngine(lines.append)
+    engine.handle('position startpos')
+    engine.handle('go infinite')
+    time.sleep(0.2)
+    
+    start = time.time()
+    engine.handle('stop')
+    
+    assert time.time() - start < 0.5
+    assert lines[-1].startswith('bestmove ')
+    assert engine.search_thread is None
+
+def test_bestmove_is_legal():
+    positions = [
+        ('8/8/8/8/2k5/4b3/2Kp4/8 w - - 4 7', ['c2b2', 'c2d1', 'c2b1']),
+        ('R5k1/5ppp/8/8/8/8/8/6K1 b - - 0 1', ['0000']),
+        ('7k/5Q2/6K1/8/8/8/8/8 b - - 0 1', ['0000'])
+    ]
+    for fen, best_moves in positions:
+        lines = []
+        engine = UCIEngine(lines.append)
+        engine.handle('position fen ' + fen)
+        engine.handle('go depth 3')
+        engine.search_thread.join()
+        
+        assert lines[-1].split()[1] in best_moves
+    
+    assert ' score cp 0 ' in lines[-2]
+
+def test_mate_scores():
+    lines = []
+    engine = UCIEngine(lines.append)
+    engine.handle('position fen 6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1')
+    engine.handle('go depth 2')
+    engine.search_thread.join()
+    
+    assert ' score mate 1 ' in lines[-2]
+    
+    engine.handle('position fen R5k1/5ppp/8/8/8/8/8/6K1 b - - 0 1')
+    engine.handle('go depth 2')
+    engine.search_thread.join()
+    
+    assert ' score mate 0 ' in lines[-2]
+    
+    # Mate in two, the table cutting the principal variation short
+    engine.handle('position fen 6k1/8/6K1/8/8/8/8/R7 b - - 0 1')
+    engine.handle('go depth 6')
+    engine.search_thread.join()
+    
+    assert ' score mate -2 ' in lines[-2]
+    
+    # Rg7 is stalemate, not mate
+    engine.handle('position fen 7k/8/5K2/8/8/8/8/6R1 w - - 0 1')
+    engine.handle('go depth 6')
+    engine.search_thread.join()
+    
+    assert ' score mate 2 ' in lines[-2] and lines[-1] == 'bestmove f6f7'
@@ -0,0 +1,210 @@
+import sys
+import threading
+
+from parallel import ParallelSearch
+from polyglot import OpeningBook
+from chessy3 import Board, TranspositionTable, START_FEN, HASH_SIZE_MB, BOOK_FILE, BOOK_SELECTION, MAX_DEPTH, MATE_THRESHOLD, MATE_VALUE, allocate_time, move_to_smith
+
+ENGINE_NAME = 'Chessy 3'
+ENGINE_AUTHOR = 'fpatrik'
+
+class UCIEngine:
+    def __init__(self, output = None):
+        self.output = output if output is not None else self.print_line
+        self.output_lock = threading.Lock()
+        self.board = Board.from_fen(START_FEN)
+        self.hash_size_mb = HASH_SIZE_MB
+        self.threads = 1
+        self.parallel_search = None
+        self.transposition_table = TranspositionTable(self.hash_size_mb)
+        self.book = self.open_book(BOOK_FILE) if BOOK_FILE is not None else None
+        self.own_book = True
+        self.search_thread = None
+        self.stop_event = threading.Event()
+
+    def print_line(self, line):
+        print(line, flush = True)
+
+    def send(self, line):
+        with self.output_lock:
+            self.output(line)
+
+    def handle(self, line):
+        # Handle one command line, returns False when the engine should quit
+        tokens = line.split()
+        if not tokens:
+            return True
+
+        command, arguments = tokens[0], tokens[1:]
+        if command == 'uci':
+            self.send('id name ' + ENGINE_NAME)
+            self.send('id author ' + ENGINE_AUTHOR)
+            self.send('option name Hash type spin default ' + str(HASH_SIZE_MB) + ' min 1 max 4096')
+            self.send('option name Threads type spin default 1 min 1 max 64')
+            self.send('option name OwnBook type check default true')
+            self.send('option name BookFile type string default ' + (BOOK_FILE or '<empty>'))
+            self.send('uciok')
+        elif command == 'isready':
+            self.send('readyok')
+        elif command == 'ucinewgame':
+            self.stop()
+            self.transposition_table.clear()
+            if self.parallel_search is not None and self.parallel_search.table is not None:
+                self.parallel_search.table.clear()
+        elif command == 'setoption':
+            self.stop()
+            self.set_option(arguments)
+        elif command == 'position':
+            self.stop()
+            self.set_position(arguments)
+        elif command == 'go':
+            self.stop()
+            self.go(arguments)
+        elif command == 'stop':
+            self.stop()
+        elif command == 'quit':
+            self.stop()
+            self.close_parallel_search()
+            if self.book is not None:
+                self.book.close()
+            return False
+
+        return True
+
+    def set_option(self, arguments):
+        # setoption name <name> value <value>
+        if 'name' not in arguments:
+            return
+
+        value_index = arguments.index('value') if 'value' in arguments else len(arguments)
+        name = ' '.join(arguments[arguments.index('name') + 1:value_index]).lower()
+        value = ' '.join(arguments[value_index + 1:])
+
+        # Invalid values are reported and ignored, the engine keeps running
+        if name == 'hash':
+            try:
+                self.hash_size_mb = max(1, int(value))
+            except ValueError:
+                self.send('info string invalid Hash value ' + value)
+                return
+            self.transposition_table = TranspositionTable(self.hash_size_mb)
+            self.close_parallel_search()
+        elif name == 'threads':
+            try:
+                self.threads = max(1, int(value))
+            except ValueError:
+                self.send('info string invalid Threads value ' + value)
+                return
+            self.close_parallel_search()
+        elif name == 'ownbook':
+            self.own_book = value.lower() == 'true'
+        elif name == 'bookfile':
+            if self.book is not None:
+                self.book.close()
+            self.book = self.open_book(value) if value and value != '<empty>' else None
+
+    def open_book(self, path):
+        # The book, or None if it can not be read
+        try:
+            return OpeningBook(path, BOOK_SELECTION)
+        except (OSError, ValueError) as error:
+            self.send('info string can not open book ' + path + ': ' + str(error))
+            return None
+
+    def close_parallel_search(self):
+        if self.parallel_search is not None:
+            self.parallel_search.close()
+            self.parallel_search = None
+
+    def set_position(self, arguments):
+        # position startpos|fen <fen> [moves <move> ...]
+        moves_index = arguments.index('moves') if 'moves' in arguments else len(arguments)
+        if arguments and arguments[0] == 'fen':
+            board = Board.from_fen(' '.join(arguments[1:moves_index]))
+        else:
+            board = Board.from_fen(START_FEN)
+
+        for notation in arguments[moves_index + 1:]:
+            move = board.smith_to_move(notation)
+            if move is None:
+                break
+            board.make_move(move)
+
+        self.board = board
+
+    def go(self, arguments):
+        options = {}
+        for index, token in enumerate(arguments):
+            if token in ['depth', 'movetime', 'wtime', 'btime', 'winc', 'binc', 'movestogo'] and index + 1 < len(arguments):
+                options[token] = int(arguments[index + 1])
+        infinite = 'infinite' in arguments
+
+        time_limit = None
+        if 'movetime' in options:
+            time_limit = options['movetime'] / 1000
+        elif not infinite:
+            clock, increment = ('wtime', 'winc') if self.board.next_move_color == 'white' else ('btime', 'binc')
+            if clock in options:
+                time_limit = allocate_time(options[clock] / 1000, options.get(increment, 0) / 1000, options.get('movestogo'))
+
+        self.stop_event = threading.Event()
+        self.search_thread = threading.Thread(target = self.search, args = (self.board, time_limit, options.get('depth', MAX_DEPTH), infinite, self.stop_event), daemon = True)
+        self.search_thread.start()
+
+    def search(self, board, time_limit, max_depth, infinite, stop_event):
+        # Play from the book without searching, unless searching infinitely
+        if self.own_book and self.book is not None and not infinite:
+            book_move = self.book.find_move(board)
+            if book_move is not None:
+                self.send('bestmove ' + move_to_smith(book_move))
+                return
+
+        def report(result):
+            duration = max(result['time'], 0.001)
+            self.send('info depth ' + str(result['depth']) + ' score ' + format_score(result['value']) + ' nodes ' + str(result['nodes']) + ' nps ' + str(int(result['nodes'] / duration)) + ' time ' + str(int(duration * 1000)) + ' pv ' + ' '.join(move_to_smith(move) for move in result['pv']))
+
+        # With more than one thread the root moves are searched by a pool of
+        # processes
+        if self.threads > 1:
+            if self.parallel_search is None:
+                self.parallel_search = ParallelSearch(self.threads, self.hash_size_mb)
+            result = self.parallel_search.iterative_deepening(board, time_limit, max_depth, report, stop_event)
+        else:
+            result = board.iterative_deepening(time_limit, max_depth, self.transposition_table, report, stop_event)
+
+        # In infinite mode the best move is only sent after stop
+        if infinite:
+            stop_event.wait()
+
+        # Only ever send a legal move, and the null move if there is none
+        moves = board.get_move_list_for_color(board.next_move_color)
+        notation = move_to_smith(result['move']) if result is not None and result['move'] is not None else None
+        best_move = next((move for move in moves if move_to_smith(move) == notation), moves[0] if moves else None)
+
+        self.send('bestmove ' + (move_to_smith(best_move) if best_move is not None else '0000'))
+
+    def stop(self):
+        if self.search_thread is not None:
+            self.stop_event.set()
+            self.search_thread.join()
+            self.search_thread = None
+
+def format_score(value):
+    # UCI score of a search value. Mate values count the plies to the king
+    # capture after the mate: 2n + 1 plies for a mate in n moves, 2n + 2
+    # plies for being mated in n moves.
+    if value > MATE_THRESHOLD:
+        return 'mate ' + str((MATE_VALUE - value) // 2)
+    if value < -MATE_THRESHOLD:
+        return 'mate ' + str(-((MATE_VALUE + value - 2) // 2))
+
+    return 'cp ' + str(value)
+
+def main():
+    engine = UCIEngine()
+    for line in sys.stdin:
+        if not engine.handle(line):
+            break
+
+if __name__ == '__main__':
+    main()